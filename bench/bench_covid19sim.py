@@ -0,0 +1,241 @@
+import sys
+sys.path.append('../src/')
+import os
+import argparse
+import json
+import statistics
+import platform
+import resource
+import subprocess
+import multiprocessing
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+import covid19sim as sim
+import covid19grid as grid
+import covid19parallel as parallel
+
+# Benchmarks of the simulation hot paths. Every scenario runs with a fixed
+# seed in a fresh process, so its peak memory is its own. Phase times are
+# inclusive: "spread" contains the "assignNurse" calls it makes.
+#
+#   python bench_covid19sim.py --output results.json
+#   python bench_covid19sim.py --quick --compare results.json
+#   python bench_covid19sim.py --startup
+
+scenarios = [
+    {"name": "default-2048", "engine": "object", "width": 64, "parameters": {}},
+    {"name": "strike-2048", "engine": "object", "width": 64, "parameters": {"strikeDays": 60}},
+    {"name": "icu-saturated-2048", "engine": "object", "width": 64,
+        "parameters": {"infectiousness": 0.3, "icuBedsPerHundredThousand": 2, "prioritizeNursePatient": True}},
+    {"name": "nurses-5pct-2048", "engine": "object", "width": 64,
+        "parameters": {"ratioNursesInPopulation": 0.05, "maxPatientsPerNurse": 1, "prioritizeNursePatient": True}},
+    {"name": "default-16k", "engine": "object", "width": 128, "parameters": {"populationSize": 16384}},
+    {"name": "strike-65k", "engine": "object", "width": 256, "parameters": {"populationSize": 65536, "strikeDays": 60}},
+    {"name": "grid-default-65k", "engine": "grid", "width": 256, "parameters": {"populationSize": 65536}},
+    {"name": "grid-icu-saturated-262k", "engine": "grid", "width": 512,
+        "parameters": {"populationSize": 262144, "infectiousness": 0.3, "icuBedsPerHundredThousand": 2, "prioritizeNursePatient": True}},
+    {"name": "grid-default-1m", "engine": "grid", "width": 1024, "parameters": {"populationSize": 1048576}},
+    {"name": "grid-strike-1m", "engine": "grid", "width": 1024, "parameters": {"populationSize": 1048576, "strikeDays": 60}}
+]
+
+# The parallel engine on the same strips with more and more workers: the runs
+# are identical, so people-days per second against the one-worker scenario
+# is the scaling over cores
+for size, width, label in [(262144, 512, "262k"), (1048576, 1024, "1m")]:
+    for workers in [1, 2, 4]:
+        scenarios.append({"name": "parallel-default-{}-{}w".format(label, workers), "engine": "parallel", "width": width,
+            "parameters": {"populationSize": size}, "strips": 4, "workers": workers,
+            "scaling": "parallel-default-{}-1w".format(label)})
+
+quickScenarios = ["default-2048", "strike-2048", "icu-saturated-2048", "grid-default-65k"]
+
+# Startup: the time a fresh interpreter takes to import each engine, the
+# way a short-lived worker process does, and which of the heavy optional
+# dependencies the import pulled in
+startupModules = ["covid19sim", "covid19grid", "covid19events"]
+heavyModules = ["pandas", "plotly", "pyarrow"]
+startupCode = """
+import sys, json
+from time import perf_counter
+start = perf_counter()
+import {module}
+seconds = perf_counter() - start
+print(json.dumps({{"importSeconds": seconds, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+class PhaseTimer:
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+
+    def wrap(self, target, methodName, phase=None):
+        phase = phase or methodName
+        method = getattr(target, methodName)
+        self.seconds.setdefault(phase, 0.0)
+        self.calls.setdefault(phase, 0)
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.seconds[phase] += perf_counter() - start
+                self.calls[phase] += 1
+
+        setattr(target, methodName, timed)
+
+    def time(self, phase, function, *args):
+        start = perf_counter()
+        result = function(*args)
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + perf_counter() - start
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        return result
+
+def runObjectScenario(scenario, timer, seed):
+    simulation = sim.Simulation(scenario["parameters"], seed=seed, width=scenario["width"])
+    timer.wrap(simulation, "initPopulation")
+    timer.wrap(simulation, "spread")
+    timer.wrap(simulation, "collectData")
+    timer.wrap(simulation.hospital, "assignNurse")
+    df = simulation.run()
+    timer.time("aggregations", sim.aggregations, df)
+    return simulation.populationSize, simulation.totalDays
+
+def runGridScenario(scenario, timer, seed):
+    sim.width = scenario["width"]
+    sim.setParameters(scenario["parameters"])
+    timer.wrap(grid.GridSimulation, "initPopulation")
+    timer.wrap(grid.GridSimulation, "step", "spread")
+    timer.wrap(grid.GridSimulation, "counts", "collectData")
+    timer.wrap(grid.GridSimulation, "assignNurse")
+    df = grid.run(seed)
+    timer.time("aggregations", sim.aggregations, df)
+    return sim.populationSize, sim.totalDays
+
+def runParallelScenario(scenario, timer, seed):
+    sim.width = scenario["width"]
+    sim.setParameters(scenario["parameters"])
+    timer.wrap(parallel.ParallelGridSimulation, "initPopulation")
+    timer.wrap(parallel.ParallelGridSimulation, "step", "spread")
+    timer.wrap(parallel.ParallelGridSimulation, "advanceStrips", "strips")
+    timer.wrap(parallel.ParallelGridSimulation, "assignNurse")
+    df = parallel.run(seed, scenario["strips"], scenario["workers"])
+    timer.time("aggregations", sim.aggregations, df)
+    return sim.populationSize, sim.totalDays
+
+def runScenario(scenario, seed, totalDays):
+    parameters = dict(scenario["parameters"])
+    if totalDays is not None:
+        parameters["totalDays"] = totalDays
+    scenario = dict(scenario, parameters=parameters)
+    timer = PhaseTimer()
+    start = perf_counter()
+    if scenario["engine"] == "grid":
+        populationSize, days = runGridScenario(scenario, timer, seed)
+    elif scenario["engine"] == "parallel":
+        populationSize, days = runParallelScenario(scenario, timer, seed)
+    else:
+        populationSize, days = runObjectScenario(scenario, timer, seed)
+    wallSeconds = perf_counter() - start
+    return {
+        "name": scenario["name"],
+        "engine": scenario["engine"],
+        "workers": scenario.get("workers"),
+        "populationSize": populationSize,
+        "totalDays": days,
+        "seed": seed,
+        "wallSeconds": wallSeconds,
+        "phaseSeconds": timer.seconds,
+        "phaseCalls": timer.calls,
+        "peakMemoryMB": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peopleDaysPerSecond": populationSize * days / wallSeconds
+    }
+
+def runIsolated(scenario, seed, totalDays):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(runScenario, scenario, seed, totalDays).result()
+
+def runStartup(module, repeats):
+    source = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+    env = dict(os.environ, PYTHONPATH=source)
+    code = startupCode.format(module=module, heavy=heavyModules)
+    importSeconds = []
+    processSeconds = []
+    for i in range(repeats):
+        start = perf_counter()
+        completed = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        processSeconds.append(perf_counter() - start)
+        measured = json.loads(completed.stdout)
+        importSeconds.append(measured["importSeconds"])
+    return {
+        "name": "startup-" + module,
+        "module": module,
+        "repeats": repeats,
+        "importSeconds": statistics.median(importSeconds),
+        "processSeconds": statistics.median(processSeconds),
+        "loaded": measured["loaded"]
+    }
+
+def printStartup(result, baseline=None):
+    line = "{name:<26} {importSeconds:>8.3f}s import {processSeconds:>8.3f}s process".format(**result)
+    if baseline is not None:
+        line += "  x{:.2f}".format(baseline["importSeconds"] / result["importSeconds"])
+    print(line + "  loaded: " + (", ".join(result["loaded"]) or "-"))
+
+def codeVersion():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def printResult(result, baseline=None, scaling=None):
+    line = "{name:<26} {wallSeconds:>8.2f}s {peakMemoryMB:>8.1f}MB {peopleDaysPerSecond:>14,.0f} people-days/s".format(**result)
+    if baseline is not None:
+        line += "  x{:.2f}".format(result["peopleDaysPerSecond"] / baseline["peopleDaysPerSecond"])
+    if scaling is not None:
+        line += "  x{:.2f} of 1 worker".format(result["peopleDaysPerSecond"] / scaling["peopleDaysPerSecond"])
+    print(line)
+    for phase, seconds in result["phaseSeconds"].items():
+        print("    {:<16} {:>8.3f}s {:>10} calls".format(phase, seconds, result["phaseCalls"][phase]))
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the covid19sim hot paths")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier version to compare against")
+    parser.add_argument("--scenario", action="append", help="run only these scenarios")
+    parser.add_argument("--quick", action="store_true", help="run the small scenarios for 60 days only")
+    parser.add_argument("--seed", type=int, default=2020)
+    parser.add_argument("--startup", action="store_true", help="measure only the import time of the engines")
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters per startup measurement")
+    args = parser.parse_args(argv)
+
+    selected = args.scenario or (quickScenarios if args.quick else [scenario["name"] for scenario in scenarios])
+    totalDays = 60 if args.quick else None
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {result["name"]: result for result in json.load(f)["results"]}
+
+    results = []
+    byName = {}
+    if args.startup:
+        for module in startupModules:
+            result = runStartup(module, args.repeats)
+            printStartup(result, baseline.get(result["name"]))
+            results.append(result)
+        selected = []
+    for scenario in scenarios:
+        if scenario["name"] in selected:
+            result = runIsolated(scenario, args.seed, totalDays)
+            printResult(result, baseline.get(result["name"]), byName.get(scenario.get("scaling")))
+            results.append(result)
+            byName[result["name"]] = result
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"version": codeVersion(), "python": platform.python_version(), "cpus": os.cpu_count(), "results": results}, f, indent=2)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,229 @@
+import sys
+import os
+import csv
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import covid19sim as sim
+import covid19sweep as sweep
+
+# Batch runner: scenarios read from a YAML, JSON or CSV file are run on a
+# bounded pool of worker processes, and their per-day aggregations are
+# appended to one Arrow IPC stream file, one record batch per run, as the
+# runs finish. A batch that was stopped is resumed by running it again
+# with the same output: every complete record batch in the file is kept,
+# and the runs in it are skipped. A run is only skipped when its seed, grid
+# width and every parameter match, so rerunning with another seed or after
+# editing a scenario runs it again; the earlier results stay in the file.
+#
+#   python covid19batch.py scenarios.yaml results.arrow --workers 8
+#
+# A scenario is a mapping of parameter overrides, with optional "name",
+# "seed" and "replicates" keys. JSON and YAML files hold a list of
+# scenarios, or a mapping with "scenarios" and shared "defaults"; in a CSV
+# file every row is a scenario and empty cells keep the default.
+
+scenarioKeys = ["name", "seed", "replicates"]
+
+def parseValue(name, value):
+    # CSV cells come as strings, typed like the parameter's default
+    if name == "name":
+        return value
+    if name in scenarioKeys:
+        return int(value)
+    default = sim.getParameters().get(name)
+    if isinstance(default, bool):
+        if value.lower() in ("true", "yes", "1"):
+            return True
+        if value.lower() in ("false", "no", "0"):
+            return False
+        raise ValueError("Not a boolean", name, value)
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    return value
+
+def readCsv(path):
+    scenarios = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            scenarios.append({name: parseValue(name, value.strip()) for name, value in row.items()
+                if value is not None and value.strip() != ""})
+    return scenarios
+
+def readScenarios(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return readCsv(path)
+    with open(path) as f:
+        if extension in (".yaml", ".yml"):
+            import yaml
+            document = yaml.safe_load(f)
+        elif extension == ".json":
+            document = json.load(f)
+        else:
+            raise ValueError("Unknown scenario file type", path)
+    if isinstance(document, dict):
+        defaults = document.get("defaults", {})
+        return [dict(defaults, **scenario) for scenario in document.get("scenarios", [])]
+    return document
+
+def scenarioKey(overrides, seed):
+    description = json.dumps({"overrides": overrides, "seed": seed}, sort_keys=True)
+    return hashlib.sha256(description.encode()).hexdigest()[:16]
+
+def batchRuns(scenarios, replicates=1, baseSeed=0):
+    # (name, overrides, replicate, seed) of every run; seeds depend on the
+    # scenario, not on its place in the file, so a resumed batch draws the same
+    names = set()
+    for scenario in scenarios:
+        overrides = {name: value for name, value in scenario.items() if name not in scenarioKeys}
+        for name in overrides:
+            if name not in sim.parameterNames:
+                raise ValueError("Unknown parameter", name)
+        key = scenarioKey(overrides, scenario.get("seed"))
+        name = str(scenario.get("name", key))
+        if name in names:
+            raise ValueError("Duplicate scenario", name)
+        names.add(name)
+        for replicate in range(scenario.get("replicates", replicates)):
+            if "seed" in scenario:
+                seed = int(np.random.SeedSequence([scenario["seed"], replicate]).generate_state(1)[0])
+            else:
+                seed = int(np.random.SeedSequence([baseSeed, int(key, 16), replicate]).generate_state(1)[0])
+            yield name, overrides, replicate, seed
+
+def batchSchema():
+    import pyarrow as pa
+    types = {bool: pa.bool_(), int: pa.int64(), float: pa.float64()}
+    fields = [pa.field("Scenario", pa.string()), pa.field("Replicate", pa.int64()), pa.field("Seed", pa.int64()),
+        pa.field("Width", pa.int64())]
+    for name, value in sim.getParameters().items():
+        fields.append(pa.field(name, types[type(value)]))
+    for column in sim.aggregationColumns.values():
+        fields.append(pa.field(column, pa.int64()))
+    return pa.schema(fields)
+
+def runKey(name, replicate, seed, width, parameters):
+    return (name, replicate, seed, width) + tuple(parameters[parameter] for parameter in sim.parameterNames)
+
+def batchKey(batch):
+    # the key of the run a record batch holds, from its first row
+    row = {name: batch.column(name)[0].as_py() for name in ["Scenario", "Replicate", "Seed", "Width"] + sim.parameterNames}
+    return runKey(row["Scenario"], row["Replicate"], row["Seed"], row["Width"], row)
+
+def runBatchScenario(parameters, width, name, overrides, replicate, seed, engine="object"):
+    # the width is set before the parameters, which derive the height from it
+    sim.width = width
+    df = sweep.runScenario(parameters, overrides, replicate, seed, engine)
+    df = df.drop(columns=list(overrides))
+    df.insert(0, "Scenario", name)
+    df.insert(3, "Width", width)
+    for parameter, value in sim.getParameters().items():
+        df[parameter] = value
+    return df
+
+def readBatches(path, schema=None):
+    # the complete record batches of a stream, however it was stopped
+    import pyarrow as pa
+    batches = []
+    with pa.OSFile(path) as source:
+        try:
+            reader = pa.ipc.open_stream(source)
+        except (pa.ArrowInvalid, OSError):
+            # stopped before the schema was written
+            return batches
+        if schema is not None and not reader.schema.equals(schema):
+            raise ValueError("Output was written with other columns", path)
+        try:
+            for batch in reader:
+                batches.append(batch)
+        except (pa.ArrowInvalid, OSError):
+            pass
+    return batches
+
+def readBatch(path):
+    import pyarrow as pa
+    batches = readBatches(path)
+    if len(batches) == 0:
+        return batchSchema().empty_table().to_pandas()
+    return pa.Table.from_batches(batches).to_pandas()
+
+def runBatch(scenarios, output, replicates=1, baseSeed=0, maxWorkers=None, engine="object", progress=None):
+    import pyarrow as pa
+    schema = batchSchema()
+    parameters = sim.getParameters()
+    width = sim.width
+    done = set()
+    kept = []
+    if os.path.exists(output):
+        kept = readBatches(output, schema)
+        done = {batchKey(batch) for batch in kept}
+    runs = []
+    skipped = 0
+    for name, overrides, replicate, seed in batchRuns(scenarios, replicates, baseSeed):
+        if runKey(name, replicate, seed, width, dict(parameters, **overrides)) in done:
+            skipped += 1
+        else:
+            runs.append((name, overrides, replicate, seed))
+
+    # the kept batches are copied to a fresh stream, which replaces the
+    # output before anything new is written to it
+    staging = output + ".partial"
+    sink = open(staging, "wb")
+    writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for batch in kept:
+            writer.write_batch(batch)
+        sink.flush()
+        os.replace(staging, output)
+
+        maxWorkers = maxWorkers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+            pending = set()
+            queued = iter(runs)
+            completed = 0
+            while True:
+                # never more than two runs a worker in flight, however long the batch
+                for run in queued:
+                    pending.add(executor.submit(runBatchScenario, parameters, width, *run, engine))
+                    if len(pending) >= 2 * maxWorkers:
+                        break
+                if len(pending) == 0:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    df = future.result()[schema.names]
+                    writer.write_batch(pa.RecordBatch.from_pandas(df, schema=schema, preserve_index=False))
+                    sink.flush()
+                    completed += 1
+                    if progress is not None:
+                        progress(completed, len(runs))
+    finally:
+        writer.close()
+        sink.close()
+    return len(runs), skipped
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Run a file of covid19sim scenarios")
+    parser.add_argument("scenarios", help="YAML, JSON or CSV file of scenarios")
+    parser.add_argument("output", help="Arrow IPC stream file the aggregations are appended to")
+    parser.add_argument("--workers", type=int, help="worker processes, the number of CPUs by default")
+    parser.add_argument("--replicates", type=int, default=1, help="runs of every scenario without its own")
+    parser.add_argument("--seed", type=int, default=0, help="base seed of scenarios without their own")
+    parser.add_argument("--engine", choices=["object", "grid"], default="object")
+    parser.add_argument("--width", type=int, default=sim.width, help="width of the grid")
+    args = parser.parse_args(argv)
+
+    sim.width = args.width
+    sim.setParameters({})
+    scenarios = readScenarios(args.scenarios)
+    progress = lambda completed, total: print("{}/{} runs".format(completed, total), file=sys.stderr)
+    ran, skipped = runBatch(scenarios, args.output, args.replicates, args.seed, args.workers, args.engine, progress)
+    print("{} runs done, {} already in {}".format(ran, skipped, args.output))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import covid19sim as sim
+import covid19grid as grid
+
+# On-disk cache of run() and runAggregations() results. An entry is keyed by
+# a hash of every model parameter, the grid width, the seed, the engine and
+# the source of the modules that produced it, so editing the model is enough
+# to stop old entries from being found. Only seeded runs are cached: a run
+# without a seed is never repeated.
+#
+# Every entry is a directory with one .npy file per column and a JSON header;
+# cached frames are loaded memory-mapped, so only the pages that are read
+# come off the disk. String columns are stored as the codes of a categorical
+# and load as categoricals over the memory-mapped codes. The least recently used entries are evicted once the cache grows
+# past maxBytes; a hit touches the header, whose modification time is the
+# entry's last use.
+
+engineModules = {
+    "object": [sim],
+    "grid": [sim, grid]
+}
+
+HEADER = "header.json"
+
+codeVersions = {}
+
+def codeVersion(engine):
+    if engine not in engineModules:
+        raise ValueError("Unknown engine", engine)
+    if engine not in codeVersions:
+        digest = hashlib.sha256()
+        for module in engineModules[engine]:
+            with open(module.__file__, "rb") as f:
+                digest.update(f.read())
+        codeVersions[engine] = digest.hexdigest()
+    return codeVersions[engine]
+
+def resultKey(kind, seed, engine="object", parameters=None):
+    if parameters is None:
+        parameters = sim.getParameters()
+    description = {
+        "kind": kind,
+        "parameters": parameters,
+        "width": sim.width,
+        "seed": seed,
+        "engine": engine,
+        "code": codeVersion(engine)
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+def writeFrame(directory, df):
+    columns = []
+    for i, (name, values) in enumerate(df.items()):
+        column = {"name": name, "file": "%d.npy" % i}
+        if values.dtype.kind in "biuf":
+            data = values.to_numpy()
+        else:
+            # codes in the integer type pandas keeps them in, so loading
+            # them doesn't copy
+            categorical = pd.Categorical(values)
+            data = categorical.codes
+            column["categories"] = categorical.categories.tolist()
+        np.save(os.path.join(directory, column["file"]), data, allow_pickle=False)
+        columns.append(column)
+    with open(os.path.join(directory, HEADER), "w") as f:
+        json.dump({"columns": columns, "rows": len(df)}, f)
+
+def readFrame(directory):
+    with open(os.path.join(directory, HEADER)) as f:
+        header = json.load(f)
+    data = {}
+    for column in header["columns"]:
+        values = np.load(os.path.join(directory, column["file"]), mmap_mode="r")
+        if "categories" in column:
+            values = pd.Categorical.from_codes(values, column["categories"])
+        data[column["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+class ResultCache:
+
+    def __init__(self, directory, maxBytes=1 << 30):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            df = readFrame(path)
+        except FileNotFoundError:
+            return None
+        os.utime(os.path.join(path, HEADER))
+        return df
+
+    def put(self, key, df):
+        # written aside and renamed into place, so readers never see half an entry
+        staging = tempfile.mkdtemp(prefix=".", dir=self.directory)
+        try:
+            writeFrame(staging, df)
+            os.rename(staging, self.path(key))
+        except OSError:
+            # another process stored the same entry first
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.exists(self.path(key)):
+                raise
+        self.evict()
+
+    def entries(self):
+        entries = []
+        for key in os.listdir(self.directory):
+            path = self.path(key)
+            if key.startswith("."):
+                continue
+            try:
+                lastUsed = os.path.getmtime(os.path.join(path, HEADER))
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+            except FileNotFoundError:
+                continue
+            entries.append((lastUsed, key, size))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for lastUsed, key, size in self.entries())
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for lastUsed, key, size in entries)
+        for lastUsed, key, size in entries:
+            if total <= self.maxBytes:
+                break
+            shutil.rmtree(self.path(key), ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for lastUsed, key, size in self.entries():
+            shutil.rmtree(self.path(key), ignore_errors=True)
+
+    def cached(self, kind, seed, engine, compute):
+        if seed is None:
+            return compute()
+        key = resultKey(kind, seed, engine)
+        df = self.get(key)
+        if df is None:
+            df = compute()
+            self.put(key, df)
+        return df
+
+    def run(self, seed=None, engine="object"):
+        if engine == "grid":
+            return self.cached("run", seed, engine, lambda: grid.run(seed))
+        return self.cached("run", seed, engine, lambda: sim.run(seed))
+
+    def aggregations(self, seed=None, engine="object"):
+        if engine == "grid":
+            return self.cached("aggregations", seed, engine, lambda: sim.aggregations(grid.run(seed)))
+        return self.cached("aggregations", seed, engine, lambda: sim.runAggregations(seed=seed)[0])
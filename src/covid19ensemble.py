@@ -0,0 +1,154 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import covid19sim as sim
+import covid19sweep as sweep
+
+# Monte Carlo ensembles: seeded replicates of the same scenario are folded,
+# one aggregations() frame at a time, into running per-day statistics, so
+# memory grows with the number of days rather than the number of replicates.
+
+ensembleColumns = ["Total Dead", "Total Nurses Dead", "ICU Occupancy"]
+
+class RunningMoments:
+
+    # Welford's online mean and variance, one value per day
+
+    def __init__(self, days):
+        self.count = 0
+        self.mean = np.zeros(days)
+        self.m2 = np.zeros(days)
+
+    def add(self, values):
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+
+    def variance(self):
+        if self.count < 2:
+            return np.full(len(self.mean), np.nan)
+        return self.m2 / (self.count - 1)
+
+    def halfWidth(self, z):
+        return z * np.sqrt(self.variance() / self.count)
+
+class P2Quantile:
+
+    # The P-square streaming quantile estimate (Jain and Chlamtac), with five
+    # markers per day updated together; the first five values are kept as is
+
+    def __init__(self, p, days):
+        self.p = p
+        self.initial = []
+        self.heights = None
+        self.positions = np.tile(np.arange(1.0, 6.0)[:, None], (1, days))
+        self.desired = np.tile(np.array([1, 1 + 2*p, 1 + 4*p, 3 + 2*p, 5])[:, None], (1, days))
+        self.increments = np.array([0, p/2, p, (1 + p)/2, 1])[:, None]
+
+    def add(self, values):
+        if self.heights is None:
+            self.initial.append(np.asarray(values, dtype=float))
+            if len(self.initial) == 5:
+                self.heights = np.sort(np.array(self.initial), axis=0)
+            return
+
+        q = self.heights
+        n = self.positions
+        q[0] = np.minimum(q[0], values)
+        q[4] = np.maximum(q[4], values)
+        # markers above the cell the value falls in move up one position
+        k = (values >= q[1]).astype(int) + (values >= q[2]) + (values >= q[3])
+        n += np.arange(5)[:, None] > k
+        self.desired += self.increments
+
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            move = ((d >= 1) & (n[i + 1] - n[i] > 1)) | ((d <= -1) & (n[i - 1] - n[i] < -1))
+            if not move.any():
+                continue
+            d = np.where(move, np.sign(d), 0)
+            parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+            neighbour = np.where(d > 0, i + 1, i - 1)
+            qn = np.choose(neighbour - (i - 1), [q[i - 1], q[i], q[i + 1]])
+            nn = np.choose(neighbour - (i - 1), [n[i - 1], n[i], n[i + 1]])
+            linear = q[i] + d * (qn - q[i]) / np.where(move, nn - n[i], 1)
+            inside = (q[i - 1] < parabolic) & (parabolic < q[i + 1])
+            q[i] = np.where(move, np.where(inside, parabolic, linear), q[i])
+            n[i] += d
+
+    def value(self):
+        if self.heights is None:
+            return np.quantile(np.array(self.initial), self.p, axis=0)
+        return self.heights[2].copy()
+
+class Ensemble:
+
+    def __init__(self, days, columns=ensembleColumns, quantiles=(0.05, 0.95)):
+        self.days = days
+        self.columns = list(columns)
+        self.quantiles = list(quantiles)
+        self.moments = {column: RunningMoments(days) for column in self.columns}
+        self.sketches = {column: [P2Quantile(p, days) for p in self.quantiles] for column in self.columns}
+
+    def count(self):
+        return self.moments[self.columns[0]].count
+
+    def add(self, df):
+        for column in self.columns:
+            values = df[column].to_numpy(dtype=float)
+            self.moments[column].add(values)
+            for sketch in self.sketches[column]:
+                sketch.add(values)
+
+    def converged(self, tolerance, z=1.96):
+        # every confidence interval of a mean is within tolerance of it,
+        # relative to the mean or to one person, whichever is larger
+        for moments in self.moments.values():
+            if moments.count < 2:
+                return False
+            if (moments.halfWidth(z) > tolerance * np.maximum(np.abs(moments.mean), 1)).any():
+                return False
+        return True
+
+    def summary(self, z=1.96):
+        data = {"Day": np.arange(1, self.days + 1)}
+        for column in self.columns:
+            moments = self.moments[column]
+            data[column + " Mean"] = moments.mean.copy()
+            data[column + " Std"] = np.sqrt(moments.variance())
+            data[column + " CI"] = moments.halfWidth(z)
+            for p, sketch in zip(self.quantiles, self.sketches[column]):
+                data[column + " " + format(p * 100, "g") + "%"] = sketch.value()
+        df = pd.DataFrame(data)
+        df["Replicates"] = self.count()
+        return df
+
+def iterReplicates(replicates, baseSeed=0, maxWorkers=None, engine="object"):
+    # results come back in replicate order, so a given seed always folds the
+    # same runs in the same order; leaving early cancels the runs not started
+    parameters = sim.getParameters()
+    with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+        futures = [executor.submit(sweep.runScenario, parameters, {}, replicate, sweep.runSeed(baseSeed, replicate), engine)
+            for replicate in range(replicates)]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+def ensemble(replicates, baseSeed=0, maxWorkers=None, engine="object", columns=ensembleColumns,
+        quantiles=(0.05, 0.95), tolerance=None, minReplicates=10, z=1.96):
+    result = Ensemble(sim.totalDays, columns, quantiles)
+    runs = iterReplicates(replicates, baseSeed, maxWorkers, engine)
+    try:
+        for df in runs:
+            result.add(df)
+            if tolerance is not None and result.count() >= minReplicates and result.converged(tolerance, z):
+                break
+    finally:
+        runs.close()
+    return result.summary(z)
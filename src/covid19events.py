@@ -0,0 +1,180 @@
+import math
+import heapq
+from itertools import count
+from time import perf_counter
+import covid19sim as sim
+
+# Next-event engine: the same model as Simulation, driven by a queue of
+# events instead of visiting every active case every day. Events are ordered
+# by (day, infection order of the person acting, slot), which is the order
+# spread() reaches them within a day:
+#   slot k < maxDegree   a mild case infecting their k-th contact
+#   slot maxDegree       the daily turn of a nurse or a severe case,
+#                        exposing their nurse or their colleagues
+#   slot maxDegree + 1   recovery or death at recoveryTime
+# A neighbour is exposed once a day with a fixed chance, so instead of a draw
+# per day each mild case draws, per neighbour, the day the exposure first
+# succeeds; for nurses the chance changes the day after ppeArrivalDay, and
+# the draw restarts there. Strikes only matter when a nurse is looked for,
+# so they are read off the day of the event. Runs follow the same
+# distribution as Simulation, not the same random draws. With an
+# Instrumentation, the exposures of a contact are only counted on the day
+# one infects, since the days it failed are never drawn one by one.
+
+class EventSimulation(sim.Simulation):
+
+    def initPopulation(self):
+        self.events = []
+        self.sequence = count()
+        self.order = {}
+        self.infectedOn = {}
+        self.fresh = []
+        # the first case is activated before its neighbours exist
+        self.scheduling = False
+        super().initPopulation()
+        if self.adjacency is not None:
+            self.turnSlot = self.adjacency.maxDegree()
+        else:
+            self.turnSlot = len(sim.topologies[self.topology][0])
+        self.resolutionSlot = self.turnSlot + 1
+        self.scheduling = True
+        for person in self.infected:
+            self.activate(person, self.day)
+        self.fresh = list(self.infected)
+
+    def activate(self, person, day):
+        if not self.scheduling:
+            return
+        seq = next(self.sequence)
+        self.order[person] = seq
+        self.infectedOn[person] = day
+        end = self.resolutionDay(day)
+
+        if person.severity is sim.Severity.MILD:
+            for slot, i in enumerate(self.neighbourIndices(person)):
+                neighbour = self.people[i]
+                if neighbour.infectionDay is None:
+                    exposureDay = self.exposureDay(neighbour, day + 1, end)
+                    if exposureDay is not None:
+                        heapq.heappush(self.events, (exposureDay, seq, slot, person, neighbour))
+        if isinstance(person, sim.Nurse) or person.isSevere():
+            self.push(day + 1, seq, self.turnSlot, person)
+        if end is not None:
+            self.push(end, seq, self.resolutionSlot, person)
+
+    def push(self, day, seq, slot, person):
+        if day <= self.totalDays:
+            heapq.heappush(self.events, (day, seq, slot, person, None))
+
+    def resolutionDay(self, day):
+        if self.recoveryTime >= 1:
+            return day + self.recoveryTime
+        return None
+
+    def exposureDay(self, person, start, end):
+        # the first day from start on that a daily exposure infects
+        chance = self.infectiousness
+        if isinstance(person, sim.Nurse):
+            ppeDay = self.ppeArrivalDay + 1
+            if start < ppeDay:
+                day = self.firstSuccess(start, chance)
+                if day is None or day >= ppeDay:
+                    start = ppeDay
+                    day = None
+            else:
+                day = None
+            if day is None:
+                day = self.firstSuccess(start, self.getInfectionChance(True))
+        else:
+            day = self.firstSuccess(start, chance)
+        if day is None or day > self.totalDays or (end is not None and day > end):
+            return None
+        return day
+
+    def firstSuccess(self, start, chance):
+        if chance <= 0:
+            return None
+        if chance >= 1:
+            return start
+        return start + int(math.log1p(-self.random()) / math.log1p(-chance))
+
+    def step(self):
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            self.processDay()
+        else:
+            instrumentation.beginDay(self.day + 1)
+            start = perf_counter()
+            self.processDay()
+            instrumentation.seconds["spread"] += perf_counter() - start
+
+    def processDay(self):
+        # yesterday's cases are no longer new, whether or not they act today
+        for person in self.fresh:
+            if person.infectionDay == 1:
+                person.infectionDay = 2
+        strike = self.day <= self.strikeDays
+        hasPpe = self.day >= self.ppeArrivalDay
+        self.day += 1
+        day = self.day
+
+        instrumentation = self.instrumentation
+        newlyInfected = []
+        while len(self.events) > 0 and self.events[0][0] == day:
+            day, seq, slot, person, neighbour = heapq.heappop(self.events)
+            if slot < self.turnSlot:
+                if neighbour.infectionDay is None and not neighbour.isDead() and not neighbour.isRecovered():
+                    if instrumentation is not None:
+                        instrumentation.exposures += 1
+                    self.infectExposed(neighbour, newlyInfected, strike)
+            elif slot == self.turnSlot:
+                self.turn(person, seq, day, newlyInfected, strike, hasPpe)
+            else:
+                person.infectionDay = self.recoveryTime
+                person.progress()
+
+        for person in newlyInfected:
+            self.activate(person, day)
+        self.infected.extend(newlyInfected)
+        self.fresh = newlyInfected
+        if self.isFinished():
+            self.settleInfectionDays()
+
+    def turn(self, person, seq, day, newlyInfected, strike, hasPpe):
+        infectedOn = self.infectedOn[person]
+        end = self.resolutionDay(infectedOn)
+        isNurse = isinstance(person, sim.Nurse)
+        if isNurse and end is not None and day - 1 >= end and self.colleaguesInfectedBy(person, day - 1):
+            return
+
+        if person.nurse is not None:
+            self.expose(person.nurse, newlyInfected, strike, hasPpe)
+        elif isNurse:
+            for colleague in self.getColleagues(person):
+                self.expose(colleague, newlyInfected, strike, hasPpe)
+        person.infectionDay = day - infectedOn + 1
+
+        if isNurse or (not person.isDead() and (end is None or day < end)):
+            self.push(day + 1, seq, self.turnSlot, person)
+
+    def colleaguesInfectedBy(self, nurse, day):
+        # retire() takes a nurse out once all colleagues were infected
+        for colleague in self.getColleagues(nurse):
+            infectedOn = self.infectedOn.get(colleague)
+            if infectedOn is None or infectedOn > day:
+                return False
+        return True
+
+    def settleInfectionDays(self):
+        # the infection days progress() would have reached by the last day,
+        # for cases without a daily turn that haven't resolved yet
+        for person in self.infected:
+            end = self.resolutionDay(self.infectedOn[person])
+            if not isinstance(person, sim.Nurse) and (end is None or end > self.day):
+                person.infectionDay = self.day - self.infectedOn[person] + 1
+
+    def saveCheckpoint(self, path):
+        raise ValueError("Event-driven simulations can't be checkpointed")
+
+def runAggregations(snapshotDays=(), seed=None):
+    return EventSimulation(seed=seed, width=sim.width, height=sim.height).runAggregations(snapshotDays)
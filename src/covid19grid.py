@@ -0,0 +1,320 @@
+import math
+from collections import deque
+import numpy as np
+import covid19sim as sim
+
+# Vectorized engine: the same model as covid19sim.run(), with the population
+# held in flat NumPy arrays over the width x height grid instead of Person objects.
+
+UNINFECTED = 0
+INFECTED = 1
+DEAD = 2
+RECOVERED = 3
+
+NO_SEVERITY = 0
+MILD = 1
+NONINV_VENT = 2
+INV_VENT = 3
+
+def nurseMask(size):
+    i = np.arange(size)
+    mask = np.zeros(size, dtype=bool)
+    if sim.ratioNursesInPopulation == 0:
+        return mask
+    divisor = 3
+    peoplePerNurse = 1/sim.ratioNursesInPopulation
+    for n in range(divisor):
+        mask |= (i % divisor == n) & (i % round(peoplePerNurse) == round(peoplePerNurse * n/divisor))
+    return mask
+
+class GridSimulation:
+
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.initPopulation()
+
+    def initPopulation(self):
+        self.size = sim.populationSize
+        self.width = sim.width
+        self.height = sim.height
+        self.rows = math.ceil(self.size / self.width)
+        cells = self.rows * self.width
+
+        self.outcome = np.zeros(cells, dtype=np.uint8)
+        self.severity = np.zeros(cells, dtype=np.uint8)
+        self.infectionDay = np.zeros(cells, dtype=np.int32)
+        self.isNurse = np.zeros(cells, dtype=bool)
+        self.isNurse[:self.size] = nurseMask(self.size)
+        self.nurseOf = np.full(cells, -1, dtype=np.int64)
+        self.patientCount = np.zeros(cells, dtype=np.int32)
+
+        # only cells inside validCoordinate() can be reached through the grid
+        self.reachable = np.zeros(cells, dtype=bool)
+        self.reachable[:min(self.size, self.height * self.width)] = True
+
+        # nurses are colleagues of the previous and next nurse in index order,
+        # and join the round robin the same way initPopulation() builds it;
+        # the round robin is a fixed ring with a moving head instead of a
+        # rotating deque, so a full rotation is a no-op rather than a scan
+        self.nurseIndex = np.flatnonzero(self.isNurse)
+        nurses = deque()
+        self.patients = {}
+        for i in self.nurseIndex.tolist():
+            self.patients[i] = []
+            if i % 2 == 0:
+                nurses.append(i)
+            else:
+                nurses.appendleft(i)
+        self.ring = np.array(nurses, dtype=np.int64)
+        self.head = 0
+        self.ringPosition = np.full(cells, -1, dtype=np.int64)
+        self.ringPosition[self.ring] = np.arange(len(self.ring))
+        self.available = np.zeros(len(self.ring), dtype=bool)
+        self.refreshNurses(self.ring)
+
+        self.day = 1
+        self.totalIcuBeds = sim.getTotalIcuBeds()
+        self.occupiedBeds = sim.IcuBeds(self.totalIcuBeds, sim.totalDays)
+
+        seed = math.floor(self.size / 2) + math.floor(self.width / 2)
+        self.outcome[seed] = INFECTED
+        self.severity[seed] = MILD
+        self.infectionDay[seed] = 1
+
+    def grid(self, values):
+        return values.reshape(self.rows, self.width)
+
+    def nurses(self):
+        return self.ring[self.head:].tolist() + self.ring[:self.head].tolist()
+
+    def refreshNurses(self, indices):
+        nurses = indices[self.isNurse[indices]]
+        outcome = self.outcome[nurses]
+        self.available[self.ringPosition[nurses]] = (outcome != DEAD) \
+            & ((self.severity[nurses] <= MILD) | (outcome == RECOVERED)) \
+            & (self.patientCount[nurses] < sim.maxPatientsPerNurse)
+
+    def neighbourExposures(self, spreaders):
+        s = self.grid(spreaders).astype(np.int8)
+        counts = np.zeros_like(s)
+        counts[1:, :] += s[:-1, :]
+        counts[:-1, :] += s[1:, :]
+        counts[:, 1:] += s[:, :-1]
+        counts[:, :-1] += s[:, 1:]
+        counts = counts.reshape(-1)
+        counts[~self.reachable] = 0
+        return counts
+
+    def nurseExposures(self):
+        counts = self.patientCount.copy()
+        counts[self.nurseIndex] = self.nurseExposureCounts()
+        return counts
+
+    def nurseExposureCounts(self):
+        # exposures of each nurse, in nurseIndex order, to patients and colleagues
+        counts = self.patientCount[self.nurseIndex]
+        if len(self.nurseIndex) > 1:
+            exposing = (self.outcome[self.nurseIndex] != UNINFECTED) & (self.nurseOf[self.nurseIndex] < 0)
+            counts[1:] += exposing[:-1]
+            counts[:-1] += exposing[1:]
+        return counts
+
+    def step(self, strike, hasPpe):
+        self.day += 1
+        wasInfected = self.outcome != UNINFECTED
+        spreaders = (self.outcome == INFECTED) & (self.severity == MILD)
+        exposures = self.neighbourExposures(spreaders) + self.nurseExposures()
+
+        candidates = np.flatnonzero((exposures > 0) & ~wasInfected)
+        if hasPpe:
+            protection = sim.ppeProtection
+        else:
+            protection = 0
+        p = np.where(self.isNurse[candidates], sim.infectiousness * (1 - protection), sim.infectiousness)
+        infection = 1 - (1 - p) ** exposures[candidates]
+        newlyInfected = candidates[self.rng.random(len(candidates)) < infection]
+
+        severe = self.rng.random(len(newlyInfected)) < sim.proportionSevere
+        critical = self.rng.random(len(newlyInfected)) < sim.proportionSevereCritical
+        severity = np.where(severe, np.where(critical, INV_VENT, NONINV_VENT), MILD).astype(np.uint8)
+
+        self.progress(wasInfected)
+        self.infect(newlyInfected, severity, severe, strike)
+
+    def infect(self, newlyInfected, severity, severe, strike):
+        self.outcome[newlyInfected] = INFECTED
+        self.severity[newlyInfected] = severity
+        self.infectionDay[newlyInfected] = 1
+        self.refreshNurses(newlyInfected)
+        self.admit(self.rng.permutation(newlyInfected[severe]), strike)
+
+    def progress(self, wasInfected):
+        self.infectionDay[wasInfected] += 1
+        resolving = np.flatnonzero(wasInfected & (self.infectionDay == sim.recoveryTime + 1))
+        severe = (self.severity[resolving] == NONINV_VENT) | (self.severity[resolving] == INV_VENT)
+        fatal = severe & (self.rng.random(len(resolving)) * sim.proportionSevere < sim.fatalityRate)
+        self.resolve(resolving, fatal)
+
+    def resolve(self, resolving, fatal):
+        recovering = resolving[~fatal & (self.outcome[resolving] == INFECTED)]
+        for i in resolving[fatal].tolist():
+            self.die(i)
+        for i in recovering[(self.nurseOf[recovering] >= 0)].tolist():
+            self.releaseNurse(i)
+        for i in recovering.tolist():
+            self.occupiedBeds.release(i, self.day)
+        self.outcome[recovering] = RECOVERED
+        self.refreshNurses(recovering)
+
+    def admit(self, newlySevere, strike):
+        for i in newlySevere.tolist():
+            if self.severity[i] == INV_VENT and not self.assignIcuBed(i):
+                self.die(i)
+
+            if self.isNurse[i]:
+                # all of them leave the nurse before any is reassigned, like
+                # Hospital.releasePatients()
+                patients = self.patients[i]
+                self.patients[i] = []
+                self.patientCount[i] = 0
+                self.nurseOf[patients] = -1
+                self.refreshNurses(np.array([i]))
+                for patient in patients:
+                    self.findNurse(patient, strike)
+
+            if self.outcome[i] != DEAD:
+                self.findNurse(i, strike)
+
+    def die(self, i):
+        self.releaseNurse(i)
+        self.occupiedBeds.release(i, self.day)
+        self.outcome[i] = DEAD
+        self.refreshNurses(np.array([i]))
+
+    def releaseNurse(self, i):
+        nurse = self.nurseOf[i]
+        if nurse >= 0:
+            self.patients[nurse].remove(i)
+            self.patientCount[nurse] -= 1
+            self.nurseOf[i] = -1
+            self.refreshNurses(np.array([nurse]))
+
+    def attachNurse(self, nurse, i):
+        self.patients[nurse].append(i)
+        self.patientCount[nurse] += 1
+        self.nurseOf[i] = nurse
+        self.refreshNurses(np.array([nurse]))
+
+    def findNurse(self, i, strike):
+        if strike or not self.assignNurse(i):
+            self.die(i)
+
+    def assignNurse(self, i):
+        # same nurse the deque rotation would reach first, found from the head
+        # of the ring; when nobody is available the rotation ends where it began
+        position = None
+        if self.available[self.head:].any():
+            position = self.head + int(np.argmax(self.available[self.head:]))
+        elif self.available[:self.head].any():
+            position = int(np.argmax(self.available[:self.head]))
+
+        if position is not None:
+            self.head = (position + 1) % len(self.ring)
+            self.attachNurse(self.ring[position], i)
+            return True
+
+        if sim.prioritizeNursePatient and self.isNurse[i]:
+            newestNonNursePatient = self.findNewestNonNursePatient()
+            if newestNonNursePatient is None:
+                return False
+            else:
+                nurseToFree = self.nurseOf[newestNonNursePatient]
+                self.die(newestNonNursePatient)
+                self.attachNurse(nurseToFree, i)
+                return True
+        else:
+            return False
+
+    def findNewestNonNursePatient(self):
+        newest = None
+        for nurse in self.nurses():
+            for patient in self.patients[nurse]:
+                if not self.isNurse[patient] and (newest is None or self.infectionDay[patient] < self.infectionDay[newest]):
+                    newest = patient
+        return newest
+
+    def assignIcuBed(self, i):
+        beds = self.occupiedBeds
+        isNurse = bool(self.isNurse[i])
+        bedAvailable = False
+        if not beds.isFull():
+            bedAvailable = True
+        elif sim.prioritizeNursePatient and isNurse:
+            nonNurse = beds.oldestNonNurse()
+            if nonNurse is not None:
+                self.die(nonNurse)
+                beds.preempt(self.day)
+                bedAvailable = True
+        if bedAvailable:
+            beds.admit(i, isNurse, self.day)
+            return True
+        else:
+            beds.reject(self.day)
+            return False
+
+    def icuTimeSeries(self):
+        return self.occupiedBeds.timeSeries(self.day)
+
+    def raster(self):
+        # legend codes of covid19sim.legendNames
+        state = np.select([self.outcome == UNINFECTED, self.outcome == RECOVERED, self.outcome == DEAD, self.severity == MILD,
+            self.severity == NONINV_VENT], [0, 1, 5, 2, 3], 4).astype(np.uint8)
+        raster = state * 2 + self.isNurse
+        raster[self.size:] = sim.NO_PERSON
+        return self.grid(raster)
+
+    def counts(self, day):
+        wasInfected = self.outcome != UNINFECTED
+        isDead = self.outcome == DEAD
+        newlyInfected = self.infectionDay == 1
+        severe = (self.severity == NONINV_VENT) | (self.severity == INV_VENT)
+        return {
+            "day": day,
+            "wasInfected": int(np.count_nonzero(wasInfected)),
+            "isDead": int(np.count_nonzero(isDead)),
+            "isRecovered": int(np.count_nonzero(self.outcome == RECOVERED)),
+            "newlyInfected": int(np.count_nonzero(newlyInfected)),
+            "newlyInfectedSevere": int(np.count_nonzero(newlyInfected & severe)),
+            "wasInfectedNurse": int(np.count_nonzero(wasInfected & self.isNurse)),
+            "isDeadNurse": int(np.count_nonzero(isDead & self.isNurse)),
+            "isInIcu": len(self.occupiedBeds)
+        }
+
+# Returns one row of totals per day, in the columns of collectData(), so the
+# result can be passed straight to covid19sim.aggregations().
+def run(seed=None):
+    import pandas as pd
+    grid = GridSimulation(seed)
+    rows = [grid.counts(1)]
+    for i in range(1, sim.totalDays):
+        grid.step(i <= sim.strikeDays, i >= sim.ppeArrivalDay)
+        rows.append(grid.counts(i + 1))
+    return pd.DataFrame(rows)
+
+def runRasters(seed=None):
+    grid = GridSimulation(seed)
+    yield 1, grid.raster()
+    for i in range(1, sim.totalDays):
+        grid.step(i <= sim.strikeDays, i >= sim.ppeArrivalDay)
+        yield i + 1, grid.raster()
+
+# The rows of sim.aggregations(run(seed)), one day at a time
+def runDays(seed=None):
+    grid = GridSimulation(seed)
+    yield dayRecord(grid.counts(1))
+    for i in range(1, sim.totalDays):
+        grid.step(i <= sim.strikeDays, i >= sim.ppeArrivalDay)
+        yield dayRecord(grid.counts(i + 1))
+
+def dayRecord(counts):
+    return {sim.aggregationColumns[column]: value for column, value in counts.items()}
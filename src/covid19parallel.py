@@ -0,0 +1,199 @@
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import covid19sim as sim
+import covid19grid as grid
+
+# Domain-decomposed grid engine: the grid is cut into horizontal strips of
+# whole rows, and every day each strip is spread by a worker process over
+# state arrays in shared memory. A strip reads the row above and below it
+# from its neighbours, and otherwise only its own cells. The hospital stays
+# in this process: the infections, severities and deaths drawn by the strips
+# are reconciled with it once per day, in strip order, with the same steps
+# as GridSimulation.step(). Every strip draws from its own random stream, so
+# a seed gives the same run whatever the number of workers.
+
+sharedNames = ["outcome", "severity", "infectionDay", "isNurse", "reachable"]
+
+# the arrays of the coordinating process, attached in every worker
+shared = {}
+parameters = {}
+
+def attach(specs, workerParameters):
+    for name, (shmName, dtype, size) in specs.items():
+        memory = shared_memory.SharedMemory(name=shmName)
+        shared[name] = (memory, np.ndarray(size, dtype=dtype, buffer=memory.buf))
+    parameters.update(workerParameters)
+
+def array(name):
+    return shared[name][1]
+
+def stripCounts(start, stop):
+    outcome = array("outcome")[start:stop]
+    severity = array("severity")[start:stop]
+    isNurse = array("isNurse")[start:stop]
+    wasInfected = outcome != grid.UNINFECTED
+    isDead = outcome == grid.DEAD
+    newlyInfected = array("infectionDay")[start:stop] == 1
+    severe = (severity == grid.NONINV_VENT) | (severity == grid.INV_VENT)
+    return np.array([
+        np.count_nonzero(wasInfected),
+        np.count_nonzero(isDead),
+        np.count_nonzero(outcome == grid.RECOVERED),
+        np.count_nonzero(newlyInfected),
+        np.count_nonzero(newlyInfected & severe),
+        np.count_nonzero(wasInfected & isNurse),
+        np.count_nonzero(isDead & isNurse)
+    ], dtype=np.int64)
+
+def stripExposures(start, stop):
+    # the strip's rows and one halo row on either side
+    width = parameters["width"]
+    outcome = array("outcome")
+    severity = array("severity")
+    lo = max(0, start - width)
+    hi = min(len(outcome), stop + width)
+    s = ((outcome[lo:hi] == grid.INFECTED) & (severity[lo:hi] == grid.MILD)).reshape(-1, width).astype(np.int8)
+    counts = np.zeros_like(s)
+    counts[1:, :] += s[:-1, :]
+    counts[:-1, :] += s[1:, :]
+    counts[:, 1:] += s[:, :-1]
+    counts[:, :-1] += s[:, 1:]
+    first = (start - lo) // width
+    exposures = counts[first:first + (stop - start) // width].reshape(-1).astype(np.int32)
+    exposures[~array("reachable")[start:stop]] = 0
+
+    nurseIndex = array("nurseIndex")
+    a, b = np.searchsorted(nurseIndex, [start, stop])
+    exposures[nurseIndex[a:b] - start] += array("nurseExposure")[a:b]
+    return exposures
+
+def advance(strip, hasPpe, state, stepping=True):
+    # the counts of the strip as it is, then the draws of its next day, with
+    # its own infection days moved on; everything else waits for reconciliation
+    start, stop = strip
+    counts = stripCounts(start, stop)
+    if not stepping:
+        return counts, None
+
+    rng = np.random.default_rng()
+    rng.bit_generator.state = state
+    outcome = array("outcome")[start:stop]
+    infectionDay = array("infectionDay")[start:stop]
+    wasInfected = outcome != grid.UNINFECTED
+    exposures = stripExposures(start, stop)
+
+    candidates = np.flatnonzero((exposures > 0) & ~wasInfected)
+    if hasPpe:
+        protection = parameters["ppeProtection"]
+    else:
+        protection = 0
+    infectiousness = parameters["infectiousness"]
+    p = np.where(array("isNurse")[start:stop][candidates], infectiousness * (1 - protection), infectiousness)
+    infection = 1 - (1 - p) ** exposures[candidates]
+    newlyInfected = candidates[rng.random(len(candidates)) < infection]
+
+    severe = rng.random(len(newlyInfected)) < parameters["proportionSevere"]
+    critical = rng.random(len(newlyInfected)) < parameters["proportionSevereCritical"]
+    severity = np.where(severe, np.where(critical, grid.INV_VENT, grid.NONINV_VENT), grid.MILD).astype(np.uint8)
+
+    infectionDay[wasInfected] += 1
+    resolving = np.flatnonzero(wasInfected & (infectionDay == parameters["recoveryTime"] + 1))
+    resolvingSeverity = array("severity")[start:stop][resolving]
+    resolvingSevere = (resolvingSeverity == grid.NONINV_VENT) | (resolvingSeverity == grid.INV_VENT)
+    fatal = resolvingSevere & (rng.random(len(resolving)) * parameters["proportionSevere"] < parameters["fatalityRate"])
+
+    return counts, (newlyInfected + start, severity, severe, resolving + start, fatal, rng.bit_generator.state)
+
+class ParallelGridSimulation(grid.GridSimulation):
+
+    def __init__(self, seed=None, strips=4, maxWorkers=None):
+        children = np.random.SeedSequence(seed).spawn(strips + 1)
+        self.memory = []
+        self.strips = strips
+        self.stripStates = [np.random.default_rng(child).bit_generator.state for child in children[1:]]
+        super().__init__(children[0])
+        self.executor = ProcessPoolExecutor(max_workers=maxWorkers, mp_context=multiprocessing.get_context("fork"),
+            initializer=attach, initargs=(self.specs, self.workerParameters()))
+
+    def initPopulation(self):
+        super().initPopulation()
+        self.specs = {}
+        for name in sharedNames:
+            setattr(self, name, self.share(name, getattr(self, name)))
+        self.nurseIndex = self.share("nurseIndex", self.nurseIndex)
+        self.nurseExposure = self.share("nurseExposure", np.zeros(len(self.nurseIndex), dtype=np.int32))
+
+        # strips of whole rows, as even as the rows allow
+        bounds = [round(i * self.rows / self.strips) * self.width for i in range(self.strips + 1)]
+        self.stripBounds = list(zip(bounds[:-1], bounds[1:]))
+
+    def share(self, name, values):
+        memory = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+        self.memory.append(memory)
+        array = np.ndarray(values.shape, dtype=values.dtype, buffer=memory.buf)
+        array[:] = values
+        self.specs[name] = (memory.name, values.dtype.str, values.shape)
+        return array
+
+    def workerParameters(self):
+        names = ["ppeProtection", "infectiousness", "proportionSevere", "proportionSevereCritical", "recoveryTime", "fatalityRate"]
+        workerParameters = {name: getattr(sim, name) for name in names}
+        workerParameters["width"] = self.width
+        return workerParameters
+
+    def advanceStrips(self, hasPpe=False, stepping=True):
+        futures = [self.executor.submit(advance, strip, hasPpe, state, stepping)
+            for strip, state in zip(self.stripBounds, self.stripStates)]
+        return [future.result() for future in futures]
+
+    def countsOf(self, results, day, isInIcu=None):
+        total = sum(counts for counts, draws in results)
+        names = ["wasInfected", "isDead", "isRecovered", "newlyInfected", "newlyInfectedSevere", "wasInfectedNurse", "isDeadNurse"]
+        row = {"day": day}
+        row.update(zip(names, total.tolist()))
+        row["isInIcu"] = len(self.occupiedBeds) if isInIcu is None else isInIcu
+        return row
+
+    def step(self, strike, hasPpe, day=None):
+        self.day += 1
+        self.nurseExposure[:] = self.nurseExposureCounts()
+        results = self.advanceStrips(hasPpe)
+        draws = [draw for counts, draw in results]
+        self.stripStates = [draw[5] for draw in draws]
+        # the strips counted the day before its draws, the ICU is taken then too
+        isInIcu = len(self.occupiedBeds)
+
+        # reconciliation, in strip order: deaths and recoveries first, then
+        # the new infections and their admissions, like GridSimulation.step()
+        self.resolve(np.concatenate([draw[3] for draw in draws]), np.concatenate([draw[4] for draw in draws]))
+        self.infect(np.concatenate([draw[0] for draw in draws]), np.concatenate([draw[1] for draw in draws]),
+            np.concatenate([draw[2] for draw in draws]), strike)
+        return self.countsOf(results, day, isInIcu)
+
+    def close(self):
+        self.executor.shutdown()
+        for name in sharedNames + ["nurseIndex", "nurseExposure"]:
+            setattr(self, name, None)
+        for memory in self.memory:
+            memory.close()
+            memory.unlink()
+        self.memory = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Same result as covid19grid.run() in shape, one row of totals per day; the
+# counts of each day are taken by the strips along with the next day's draws.
+def run(seed=None, strips=4, maxWorkers=None):
+    import pandas as pd
+    with ParallelGridSimulation(seed, strips, maxWorkers) as parallel:
+        rows = []
+        for i in range(1, sim.totalDays):
+            rows.append(parallel.step(i <= sim.strikeDays, i >= sim.ppeArrivalDay, i))
+        rows.append(parallel.countsOf(parallel.advanceStrips(stepping=False), sim.totalDays))
+    return pd.DataFrame(rows)
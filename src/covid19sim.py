@@ -2,9 +2,16 @@ import math
 from random import random
 from enum import Enum
 from collections import deque
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+from bisect import bisect_left
+import heapq
+from itertools import chain, islice
+from operator import length_hint
+import json
+import os
+import struct
+import zlib
+from time import perf_counter
+import numpy as np
 
 populationSize = 2048
 ratioNursesInPopulation = 0.015
@@ -21,6 +28,27 @@ strikeDays = 0
 ppeArrivalDay = 9999999
 prioritizeNursePatient = False
 
+parameterNames = [
+    "populationSize",
+    "ratioNursesInPopulation",
+    "infectiousness",
+    "ppeProtection",
+    "proportionSevere",
+    "proportionSevereCritical",
+    "recoveryTime",
+    "fatalityRate",
+    "maxPatientsPerNurse",
+    "totalDays",
+    "icuBedsPerHundredThousand",
+    "strikeDays",
+    "ppeArrivalDay",
+    "prioritizeNursePatient"
+]
+
+# parameters that place the people and nurses, which a simulation already
+# under way can't take new values of
+populationParameters = ["populationSize", "ratioNursesInPopulation"]
+
 # Model
 
 class Outcome(Enum):
@@ -36,6 +64,8 @@ class Severity(Enum):
 
 class Position:
 
+    __slots__ = ("x", "y")
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -46,9 +76,11 @@ class Position:
 class Person:
 
     label = "Regular"
+    __slots__ = ("position", "simulation", "infectionDay", "outcome", "severity", "nurse")
 
-    def __init__(self, position):
+    def __init__(self, position, simulation=None):
         self.position = position
+        self.simulation = simulation if simulation is not None else defaultSimulation
         self.infectionDay = None
         self.outcome = Outcome.UNINFECTED
         self.severity = None
@@ -71,34 +103,56 @@ class Person:
             self.outcome = Outcome.INFECTED
             self.severity = severity
             self.infectionDay = 1
+            self.simulation.tally.infect(self)
 
     def progress(self):
+        simulation = self.simulation
         self.infectionDay += 1
-        if self.isSevere() and self.infectionDay == recoveryTime + 1 and random() * proportionSevere < fatalityRate:
+        if self.isSevere() and self.infectionDay == simulation.recoveryTime + 1 and simulation.random() * simulation.proportionSevere < simulation.fatalityRate:
             self.die()
-        elif not self.isRecovered() and not self.isDead() and self.infectionDay is not None and self.infectionDay == recoveryTime + 1:
+        elif not self.isRecovered() and not self.isDead() and self.infectionDay is not None and self.infectionDay == simulation.recoveryTime + 1:
             self.releaseNurse()
-            hospital.releaseIcuBed(self)
+            simulation.hospital.releaseIcuBed(self)
+            simulation.tally.resolve(self, Outcome.RECOVERED)
             self.outcome = Outcome.RECOVERED
 
     def die(self):
         self.releaseNurse()
-        hospital.releaseIcuBed(self)
+        self.simulation.hospital.releaseIcuBed(self)
+        self.simulation.tally.resolve(self, Outcome.DEAD)
         self.outcome = Outcome.DEAD
 
     def releaseNurse(self):
         if self.nurse is not None:
-            self.nurse.patients.remove(self)
+            nurse = self.nurse
+            nurse.patients.remove(self)
             self.nurse = None
+            nurse.simulation.hospital.refreshNurse(nurse)
 
 class Nurse(Person):
 
     label = "Nurse"
+    __slots__ = ("patients",)
 
-    def __init__(self, position):
-        super().__init__(position)
+    def __init__(self, position, simulation=None):
+        super().__init__(position, simulation)
         self.patients = []
 
+    def infect(self, severity):
+        super().infect(severity)
+        self.simulation.hospital.refreshNurse(self)
+
+    def progress(self):
+        super().progress()
+        self.simulation.hospital.refreshNurse(self)
+
+    def die(self):
+        super().die()
+        self.simulation.hospital.refreshNurse(self)
+
+    def canTakePatient(self):
+        return not self.isDead() and (not self.isSevere() or self.isRecovered()) and len(self.patients) < self.simulation.maxPatientsPerNurse
+
     def patientsStr(self):
         s = ""
         for patient in self.patients:
@@ -107,278 +161,1458 @@ class Nurse(Person):
             s += str(patient)
         return "{ " + s + " }"
 
+class IcuBeds:
+
+    # The occupied ICU beds in order of admission. Non-nurse occupants are
+    # also in a heap by admission day, oldest first, for a nurse to preempt;
+    # entries of occupants who left are dropped when they reach the top.
+    # Occupants can be people or grid indices. Admissions, rejections,
+    # preemptions and the occupancy at the end of each day are kept in arrays
+    # by day, carried forward over days without any change.
+
+    dailyNames = ["occupancy", "admissions", "rejections", "preemptions"]
+
+    def __init__(self, totalBeds, days):
+        self.totalBeds = totalBeds
+        self.occupants = {}
+        self.nonNurses = []
+        self.nurseCount = 0
+        self.admitted = 0
+        self.daily = np.zeros((len(self.dailyNames), max(1, days)), dtype=np.int32)
+        self.recordedDay = 1
+
+    def __len__(self):
+        return len(self.occupants)
+
+    def __contains__(self, occupant):
+        return occupant in self.occupants
+
+    def __iter__(self):
+        return iter(self.occupants)
+
+    def isFull(self):
+        return len(self.occupants) >= self.totalBeds
+
+    def row(self, day):
+        if day > self.daily.shape[1]:
+            grown = np.zeros((len(self.dailyNames), max(day, 2 * self.daily.shape[1])), dtype=np.int32)
+            grown[:, :self.daily.shape[1]] = self.daily
+            self.daily = grown
+        if day > self.recordedDay:
+            self.daily[0, self.recordedDay:day] = self.daily[0, self.recordedDay - 1]
+            self.recordedDay = day
+        return day - 1
+
+    def admit(self, occupant, isNurse, day):
+        self.admitted += 1
+        self.occupants[occupant] = (self.admitted, isNurse)
+        if isNurse:
+            self.nurseCount += 1
+        else:
+            heapq.heappush(self.nonNurses, (day, self.admitted, occupant))
+        row = self.row(day)
+        self.daily[1, row] += 1
+        self.daily[0, row] = len(self.occupants)
+
+    def release(self, occupant, day):
+        entry = self.occupants.pop(occupant, None)
+        if entry is None:
+            return False
+        if entry[1]:
+            self.nurseCount -= 1
+        self.daily[0, self.row(day)] = len(self.occupants)
+        return True
+
+    def reject(self, day):
+        self.daily[2, self.row(day)] += 1
+
+    def preempt(self, day):
+        self.daily[3, self.row(day)] += 1
+
+    def oldestNonNurse(self):
+        nonNurses = self.nonNurses
+        while len(nonNurses) > 0:
+            day, admitted, occupant = nonNurses[0]
+            entry = self.occupants.get(occupant)
+            if entry is not None and entry[0] == admitted:
+                return occupant
+            heapq.heappop(nonNurses)
+        return None
+
+    def timeSeries(self, day):
+        # one row per day up to day, the occupancy carried forward to it
+        import pandas as pd
+        self.row(day)
+        data = {"Day": np.arange(1, day + 1)}
+        for i, name in enumerate(["ICU Occupancy", "ICU Admissions", "ICU Rejections", "ICU Preemptions"]):
+            data[name] = self.daily[i, :day].copy()
+        return pd.DataFrame(data=data)
+
 class Hospital:
 
-    def __init__(self, totalIcuBeds):
+    def __init__(self, totalIcuBeds, simulation=None):
+        self.simulation = simulation if simulation is not None else defaultSimulation
         self.reset(totalIcuBeds)
 
     def reset(self, totalIcuBeds):
         self.nurses = deque()
         self.totalIcuBeds = totalIcuBeds
-        self.occupiedBeds = set()
+        self.occupiedBeds = IcuBeds(totalIcuBeds, self.simulation.totalDays)
         self.nurseColleagues = {}
+        # The round robin over nurses is a fixed ring with a moving head, plus
+        # the sorted ring positions of nurses who can take another patient.
+        # Non-nurse patients sit in a heap, newest infection first, for
+        # preemption; entries of patients who lost their nurse are dropped
+        # when they reach the top.
+        self.ring = None
+        self.head = 0
+        self.ringPositions = {}
+        self.availableNurses = []
+        self.nonNursePatients = []
+        self.assignments = 0
+
+    def indexNurses(self, ring=None):
+        if ring is None:
+            ring = self.nurses
+        self.ring = list(ring)
+        self.head = 0
+        self.ringPositions = {nurse: position for position, nurse in enumerate(self.ring)}
+        self.availableNurses = [position for position, nurse in enumerate(self.ring) if nurse.canTakePatient()]
+
+    def refreshNurse(self, nurse):
+        position = self.ringPositions.get(nurse)
+        if position is None:
+            return
+        i = bisect_left(self.availableNurses, position)
+        isListed = i < len(self.availableNurses) and self.availableNurses[i] == position
+        if nurse.canTakePatient():
+            if not isListed:
+                self.availableNurses.insert(i, position)
+        elif isListed:
+            del self.availableNurses[i]
+
+    def attachPatient(self, nurse, person):
+        nurse.patients.append(person)
+        person.nurse = nurse
+        self.refreshNurse(nurse)
+        if self.simulation.prioritizeNursePatient and not isinstance(person, Nurse):
+            heapq.heappush(self.nonNursePatients, self.nonNursePatientEntry(person))
+
+    def nonNursePatientEntry(self, person):
+        if person.infectionDay is None:
+            infectedOn = self.simulation.day
+        else:
+            infectedOn = self.simulation.day - person.infectionDay + 1
+        self.assignments += 1
+        return (-infectedOn, self.assignments, person)
+
+    def indexNonNursePatients(self):
+        self.nonNursePatients = [self.nonNursePatientEntry(patient) for nurse in self.nurses
+            for patient in nurse.patients if not isinstance(patient, Nurse)]
+        heapq.heapify(self.nonNursePatients)
 
     def assignNurse(self, person):
-        maxedOut = 0
-        totalNurses = len(self.nurses)
-        
-        while maxedOut != totalNurses:
-            nurse = self.nurses.popleft()
-            self.nurses.append(nurse)
-            if not nurse.isDead() and (not nurse.isSevere() or nurse.isRecovered()) and len(nurse.patients) < maxPatientsPerNurse:
-                nurse.patients.append(person)
-                person.nurse = nurse
-                return True
-            else:
-                maxedOut += 1
+        if self.ring is None or len(self.ring) != len(self.nurses):
+            self.indexNurses()
+
+        # the first available nurse from the head is the one the round robin
+        # reaches first; with nobody available it ends where it started
+        if len(self.availableNurses) > 0:
+            i = bisect_left(self.availableNurses, self.head)
+            if i == len(self.availableNurses):
+                i = 0
+            position = self.availableNurses[i]
+            self.head = (position + 1) % len(self.ring)
+            self.attachPatient(self.ring[position], person)
+            return True
 
-        if prioritizeNursePatient and isinstance(person, Nurse):
+        if self.simulation.prioritizeNursePatient and isinstance(person, Nurse):
             newestNonNursePatient = self.findNewestNonNursePatient()
             if newestNonNursePatient is None:
                 return False
             else:
                 nurseToFree = newestNonNursePatient.nurse
                 newestNonNursePatient.die()
-                nurseToFree.patients.append(person)
-                person.nurse = nurseToFree
+                self.attachPatient(nurseToFree, person)
+                if self.simulation.instrumentation is not None:
+                    self.simulation.instrumentation.nursePreemptions += 1
                 return True
         else:
             return False
-    
-    def findNewestNonNursePatient(self):
-        newest = None
-        for nurse in self.nurses:
-            for patient in nurse.patients:
-                if not isinstance(patient, Nurse) and (newest is None or patient.infectionDay < newest.infectionDay):
-                    newest = patient
-        return newest
 
-    def findNonNurse(self, patients):
+    def releasePatients(self, nurse):
+        # all of a nurse's patients leave her before any is reassigned, so
+        # none of them can be preempted to make room for another on her
+        patients = nurse.patients
+        nurse.patients = []
         for patient in patients:
-            if not isinstance(patient, Nurse):
+            patient.nurse = None
+        if len(patients) > 0 and len(self.nonNursePatients) > 0:
+            released = set(patients)
+            self.nonNursePatients = [entry for entry in self.nonNursePatients if entry[2] not in released]
+            heapq.heapify(self.nonNursePatients)
+        self.refreshNurse(nurse)
+        return patients
+
+    def findNewestNonNursePatient(self):
+        while len(self.nonNursePatients) > 0:
+            patient = self.nonNursePatients[0][2]
+            if patient.nurse is not None:
                 return patient
+            heapq.heappop(self.nonNursePatients)
         return None
 
     def assignIcuBed(self, patient):
+        beds = self.occupiedBeds
+        day = self.simulation.day
+        isNurse = isinstance(patient, Nurse)
         bedAvailable = False
-        if len(self.occupiedBeds) < self.totalIcuBeds:
+        if not beds.isFull():
             bedAvailable = True
-        elif prioritizeNursePatient and isinstance(patient, Nurse):
-            nonNurse = self.findNonNurse(self.occupiedBeds)
+        elif self.simulation.prioritizeNursePatient and isNurse:
+            # the non-nurse admitted first gives up their bed
+            nonNurse = beds.oldestNonNurse()
             if nonNurse is not None:
                 nonNurse.die()
+                beds.preempt(day)
                 bedAvailable = True
+                if self.simulation.instrumentation is not None:
+                    self.simulation.instrumentation.icuPreemptions += 1
         if bedAvailable:
-            self.occupiedBeds.add(patient)
+            beds.admit(patient, isNurse, day)
             return True
         else:
+            beds.reject(day)
             return False
 
     def releaseIcuBed(self, patient):
-        self.occupiedBeds.discard(patient)
+        self.occupiedBeds.release(patient, self.simulation.day)
 
-# Functions
+    def icuTimeSeries(self):
+        return self.occupiedBeds.timeSeries(self.simulation.day)
 
-def validCoordinate(x, y):
-    return x >= 0 and x < width and y >= 0 and y < height
+class RandomStream:
 
-def getNeighbours(person):
-    neighbours = []
-    for n in [[-1,0], [1,0], [0,-1], [0,1]]:
-        x = person.position.x + n[0]
-        y = person.position.y + n[1]
-        if validCoordinate(x, y):
-            index = y * width + x
-            neighbour = people[index]
-            if neighbour.infectionDay == None:
+    # Uniform draws from a NumPy Generator, generated a block at a time and
+    # handed out by a C-level iterator, so a draw costs no Python call.
+
+    def __init__(self, seed=None, blockSize=65536):
+        self.generator = np.random.default_rng(seed)
+        self.blockSize = blockSize
+        self.blockState = None
+        self.draws = iter(())
+        self.random = chain.from_iterable(self.blocks()).__next__
+
+    def blocks(self, skip=0):
+        while True:
+            self.blockState = self.generator.bit_generator.state
+            self.draws = iter(self.generator.random(self.blockSize).tolist())
+            next(islice(self.draws, skip, skip), None)
+            skip = 0
+            yield self.draws
+
+    def getState(self):
+        # the generator state before the current block, and how far into
+        # that block the draws have got
+        if self.blockState is None:
+            return {"generator": self.generator.bit_generator.state, "blockSize": self.blockSize, "consumed": 0}
+        consumed = self.blockSize - length_hint(self.draws)
+        return {"generator": self.blockState, "blockSize": self.blockSize, "consumed": consumed}
+
+    def setState(self, state):
+        self.generator.bit_generator.state = state["generator"]
+        self.blockSize = state["blockSize"]
+        self.blockState = None
+        self.draws = iter(())
+        self.random = chain.from_iterable(self.blocks(state["consumed"])).__next__
+
+class ParquetSink:
+
+    # Writes each day's per-person rows as a Parquet row group, with legend
+    # and severity dictionary-encoded; pyarrow is only needed once used.
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def write(self, data):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        columns = {}
+        for name, values in data.items():
+            column = pa.array(values)
+            if name == "legend" or name == "severity":
+                column = column.dictionary_encode()
+            columns[name] = column
+        table = pa.table(columns)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+class Instrumentation:
+
+    # Per-day event counts and phase timings of a simulation, kept only while
+    # a run is given one. Phase times are inclusive: "spread" contains the
+    # nurse and ICU assignments made while spreading.
+
+    counterNames = [
+        "exposures",
+        "infections",
+        "nurseReassignments",
+        "nursePreemptions",
+        "icuPreemptions",
+        "icuRejections",
+        "nurseRejections"
+    ]
+    phaseNames = ["spread", "nurseReassignment", "nurseAssignment", "icuAssignment", "collect"]
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.records = []
+        self.beginDay(1)
+
+    def beginDay(self, day):
+        self.day = day
+        for name in self.counterNames:
+            setattr(self, name, 0)
+        self.seconds = dict.fromkeys(self.phaseNames, 0.0)
+
+    def endDay(self):
+        record = {"Day": self.day}
+        for name in self.counterNames:
+            record[name] = getattr(self, name)
+        for phase in self.phaseNames:
+            record[phase + "Seconds"] = self.seconds[phase]
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def toDataFrame(self):
+        import pandas as pd
+        columns = ["Day"] + self.counterNames + [phase + "Seconds" for phase in self.phaseNames]
+        return pd.DataFrame(self.records, columns=columns)
+
+class Tally:
+
+    # The aggregations() totals of a simulation, kept up to date on every
+    # infection, recovery and death instead of being counted from the people.
+    # New infections are counted for the day they happen on, so they read as
+    # zero on a day without any.
+
+    def __init__(self, simulation):
+        self.simulation = simulation
+        self.reset()
+
+    def reset(self):
+        self.wasInfected = 0
+        self.isDead = 0
+        self.isRecovered = 0
+        self.wasInfectedNurse = 0
+        self.isDeadNurse = 0
+        self.newDay = None
+        self.newlyInfected = 0
+        self.newlyInfectedSevere = 0
+
+    def infect(self, person):
+        day = self.simulation.day
+        if day != self.newDay:
+            self.newDay = day
+            self.newlyInfected = 0
+            self.newlyInfectedSevere = 0
+        self.wasInfected += 1
+        self.newlyInfected += 1
+        if person.isSevere():
+            self.newlyInfectedSevere += 1
+        if isinstance(person, Nurse):
+            self.wasInfectedNurse += 1
+
+    def resolve(self, person, outcome):
+        # the outcome a person is about to take; dying twice counts once
+        previous = person.outcome
+        if previous is outcome:
+            return
+        isNurse = isinstance(person, Nurse)
+        if previous is Outcome.DEAD:
+            self.isDead -= 1
+            if isNurse:
+                self.isDeadNurse -= 1
+        elif previous is Outcome.RECOVERED:
+            self.isRecovered -= 1
+        if outcome is Outcome.DEAD:
+            self.isDead += 1
+            if isNurse:
+                self.isDeadNurse += 1
+        elif outcome is Outcome.RECOVERED:
+            self.isRecovered += 1
+
+    def recount(self, infected):
+        # everyone who was ever infected is in the infected list
+        self.reset()
+        self.newDay = self.simulation.day
+        for person in infected:
+            isNurse = isinstance(person, Nurse)
+            self.wasInfected += 1
+            if isNurse:
+                self.wasInfectedNurse += 1
+            if person.outcome is Outcome.DEAD:
+                self.isDead += 1
+                if isNurse:
+                    self.isDeadNurse += 1
+            elif person.outcome is Outcome.RECOVERED:
+                self.isRecovered += 1
+            if person.infectionDay == 1:
+                self.newlyInfected += 1
+                if person.isSevere():
+                    self.newlyInfectedSevere += 1
+
+    def write(self, totals, day):
+        row = day - 1
+        totals["day"][row] = day
+        totals["wasInfected"][row] = self.wasInfected
+        totals["isDead"][row] = self.isDead
+        totals["isRecovered"][row] = self.isRecovered
+        if day == self.newDay:
+            totals["newlyInfected"][row] = self.newlyInfected
+            totals["newlyInfectedSevere"][row] = self.newlyInfectedSevere
+        else:
+            totals["newlyInfected"][row] = 0
+            totals["newlyInfectedSevere"][row] = 0
+        totals["wasInfectedNurse"][row] = self.wasInfectedNurse
+        totals["isDeadNurse"][row] = self.isDeadNurse
+        totals["isInIcu"][row] = len(self.simulation.hospital.occupiedBeds)
+
+class ChunkedPopulation:
+
+    # The people of a sparse simulation, in square tiles of the grid (the
+    # tile size is rounded up to a power of two). A tile is allocated when
+    # one of its cells is first looked up, and a cell gets its Person then;
+    # cells never reached stay implicit. Nurses are created up front, since
+    # the hospital needs them all from the first day.
+
+    def __init__(self, simulation, tileSize=64):
+        self.simulation = simulation
+        self.size = simulation.populationSize
+        self.width = simulation.width
+        self.shift = max(0, (tileSize - 1).bit_length())
+        self.mask = (1 << self.shift) - 1
+        self.tilesPerRow = (self.width + self.mask) >> self.shift
+        self.tiles = {}
+        self.nurses = {}
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        if i < 0 or i >= self.size:
+            raise IndexError(i)
+        y, x = divmod(i, self.width)
+        tile = (y >> self.shift) * self.tilesPerRow + (x >> self.shift)
+        cells = self.tiles.get(tile)
+        if cells is None:
+            cells = self.tiles[tile] = [None] * (1 << 2 * self.shift)
+        offset = ((y & self.mask) << self.shift) | (x & self.mask)
+        person = cells[offset]
+        if person is None:
+            person = self.nurses.get(i)
+            if person is None:
+                person = Person(Position(x, y), self.simulation)
+            cells[offset] = person
+        return person
+
+    def get(self, i):
+        # the person at i if it was ever materialized, without allocating
+        y, x = divmod(i, self.width)
+        cells = self.tiles.get((y >> self.shift) * self.tilesPerRow + (x >> self.shift))
+        if cells is not None:
+            person = cells[((y & self.mask) << self.shift) | (x & self.mask)]
+            if person is not None:
+                return person
+        return self.nurses.get(i)
+
+    def __iter__(self):
+        # untouched cells are yielded as fresh people that aren't kept
+        for i in range(self.size):
+            person = self.get(i)
+            if person is None:
+                person = Person(Position(i % self.width, i // self.width), self.simulation)
+            yield person
+
+    def items(self):
+        # (index, person) of every materialized cell and every nurse
+        side = 1 << self.shift
+        for tile, cells in self.tiles.items():
+            top = (tile // self.tilesPerRow) << self.shift
+            left = (tile % self.tilesPerRow) << self.shift
+            for offset, person in enumerate(cells):
+                if person is not None:
+                    yield (top + offset // side) * self.width + left + offset % side, person
+        for i, nurse in self.nurses.items():
+            yield i, nurse
+
+    def addNurse(self, i):
+        nurse = Nurse(Position(i % self.width, i // self.width), self.simulation)
+        self.nurses[i] = nurse
+        return nurse
+
+    def tileCount(self):
+        return len(self.tiles)
+
+# Contact topologies on the grid: the cells each person is exposed to, as
+# (dx, dy) steps in the order spread() exposes them, and whether the grid
+# wraps around at its edges
+topologies = {
+    "vonNeumann": ([(-1, 0), (1, 0), (0, -1), (0, 1)], False),
+    "moore": ([(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)], False),
+    "vonNeumannTorus": ([(-1, 0), (1, 0), (0, -1), (0, 1)], True),
+    "mooreTorus": ([(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)], True)
+}
+
+class Adjacency:
+
+    # Contacts in compressed sparse rows: the contacts of person i are
+    # indices[offsets[i]:offsets[i + 1]], indices into the people list.
+
+    def __init__(self, offsets, indices):
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int32)
+        self.indices = np.ascontiguousarray(indices, dtype=np.int32)
+        if len(self.offsets) < 1 or self.offsets[-1] != len(self.indices):
+            raise ValueError("Offsets don't match the number of indices")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def degree(self):
+        return np.diff(self.offsets)
+
+    def maxDegree(self):
+        if len(self) == 0:
+            return 0
+        return int(self.degree().max())
+
+def gridAdjacency(size, width, height, topology="vonNeumann"):
+    if topology not in topologies:
+        raise ValueError("Unknown topology", topology)
+    steps, torus = topologies[topology]
+    i = np.arange(size, dtype=np.int64)
+    x = i % width
+    y = i // width
+    columns = []
+    valid = []
+    for dx, dy in steps:
+        nx = x + dx
+        ny = y + dy
+        if torus:
+            nx %= width
+            ny %= height
+        columns.append(ny * width + nx)
+        valid.append((nx >= 0) & (nx < width) & (ny >= 0) & (ny < height))
+    columns = np.stack(columns, axis=1)
+    valid = np.stack(valid, axis=1)
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.count_nonzero(valid, axis=1), out=offsets[1:])
+    return Adjacency(offsets, columns[valid])
+
+def edgeListAdjacency(edges, size=None):
+    # undirected contacts, each listed once in either direction; contacts of
+    # a person are in increasing order, without repeats or self-contacts
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    if size is None:
+        size = int(edges.max()) + 1 if len(edges) > 0 else 0
+    if len(edges) > 0 and (edges.min() < 0 or edges.max() >= size):
+        raise ValueError("Edge list refers to people outside the population")
+    source = np.concatenate([edges[:, 0], edges[:, 1]])
+    target = np.concatenate([edges[:, 1], edges[:, 0]])
+    keys = np.unique(source[source != target] * size + target[source != target])
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // size, minlength=size), out=offsets[1:])
+    return Adjacency(offsets, keys % size)
+
+def loadEdgeList(path, size=None):
+    # whitespace separated pairs of person indices, one contact per line
+    edges = np.loadtxt(path, dtype=np.int64, usecols=(0, 1), ndmin=2, comments="#")
+    return edgeListAdjacency(edges, size)
+
+class Simulation:
+
+    def __init__(self, parameters=None, seed=None, width=64, height=None, random=None, tileSize=None, topology="vonNeumann"):
+        self.configure(getParameters(), width, height)
+        if parameters is not None:
+            self.configure(parameters, width, height)
+        if random is not None:
+            self.random = random
+            self.randomStream = None
+        else:
+            self.seed(seed)
+        self.hospital = Hospital(self.getTotalIcuBeds(), self)
+        # people are held in a ChunkedPopulation when a tile size is given
+        self.tileSize = tileSize
+        # a name in topologies or an Adjacency, like one from loadEdgeList()
+        self.topology = topology
+        self.adjacency = None
+        self.adjacencyKey = None
+        self.people = []
+        self.infected = []
+        # people still visited by spread(), in order of infection, and the day
+        # each of them is due to recover or die
+        self.active = {}
+        self.resolutions = {}
+        self.day = 1
+        self.instrumentation = None
+        self.tally = Tally(self)
+        self.resetHistory()
+
+    def configure(self, parameters, width=None, height=None):
+        for name, value in parameters.items():
+            if name not in parameterNames:
+                raise ValueError("Unknown parameter", name)
+            setattr(self, name, value)
+        if width is not None:
+            self.width = width
+        if height is not None:
+            self.height = height
+        else:
+            self.height = math.floor(self.populationSize / self.width)
+
+    def override(self, parameters):
+        # new values for a simulation under way, like one branched from a
+        # checkpoint; the hospital state built from the old values is rebuilt
+        for name in parameters:
+            if name in populationParameters:
+                raise ValueError("Cannot override a parameter of the population", name)
+        # the day every case under way resolves was scheduled with the old
+        # recovery time, and the days already run can't be taken back
+        if parameters.get("recoveryTime", self.recoveryTime) != self.recoveryTime:
+            raise ValueError("Cannot override the recovery time of cases under way", parameters["recoveryTime"])
+        if parameters.get("totalDays", self.totalDays) < self.day:
+            raise ValueError("Cannot end a simulation before the day it reached", parameters["totalDays"], self.day)
+        wasPrioritized = self.prioritizeNursePatient
+        self.configure(parameters, self.width, self.height)
+        hospital = self.hospital
+        hospital.totalIcuBeds = self.getTotalIcuBeds()
+        hospital.occupiedBeds.totalBeds = hospital.totalIcuBeds
+        head = hospital.head
+        hospital.indexNurses(hospital.ring)
+        hospital.head = head
+        if not self.prioritizeNursePatient:
+            hospital.nonNursePatients = []
+        elif not wasPrioritized:
+            hospital.indexNonNursePatients()
+
+    def seed(self, seed):
+        self.randomStream = RandomStream(seed)
+        self.random = self.randomStream.random
+
+    def validCoordinate(self, x, y):
+        return x >= 0 and x < self.width and y >= 0 and y < self.height
+
+    def getNeighbours(self, person):
+        # neighbourIndices() inlined for dense populations
+        neighbours = []
+        people = self.people
+        if self.adjacency is not None:
+            position = person.position
+            i = position.y * self.width + position.x
+            offsets = self.contactOffsets
+            indices = self.contactIndices[offsets[i]:offsets[i + 1]]
+        else:
+            indices = self.neighbourIndices(person)
+        for i in indices:
+            neighbour = people[i]
+            if neighbour.infectionDay is None:
                 neighbours.append(neighbour)
-    return neighbours
+        return neighbours
 
-def getColleagues(nurse):
-    colleagues = hospital.nurseColleagues[nurse]
-    if len(colleagues) < 1:
-        raise ValueError("Unexpected number of colleagues")
-    else:
-        return colleagues
+    def neighbourIndices(self, person):
+        position = person.position
+        if self.adjacency is not None:
+            i = position.y * self.width + position.x
+            return self.contactIndices[self.contactOffsets[i]:self.contactOffsets[i + 1]]
+        # sparse populations work the grid out as they go
+        steps, torus = topologies[self.topology]
+        width = self.width
+        height = self.height
+        indices = []
+        for dx, dy in steps:
+            x = position.x + dx
+            y = position.y + dy
+            if torus:
+                x %= width
+                y %= height
+            if x >= 0 and x < width and y >= 0 and y < height:
+                indices.append(y * width + x)
+        return indices
 
-def findNurse(patient, strike):
-    if strike or not hospital.assignNurse(patient):
-        patient.die()
+    def buildAdjacency(self):
+        if isinstance(self.topology, Adjacency):
+            if len(self.topology) != self.populationSize:
+                raise ValueError("Adjacency is not for a population of", self.populationSize)
+            self.adjacency = self.topology
+            self.adjacencyKey = None
+        elif self.topology not in topologies:
+            raise ValueError("Unknown topology", self.topology)
+        elif self.tileSize is not None:
+            self.adjacency = None
+            return
+        else:
+            key = (self.populationSize, self.width, self.height, self.topology)
+            if self.adjacencyKey != key:
+                self.adjacency = gridAdjacency(self.populationSize, self.width, self.height, self.topology)
+                self.adjacencyKey = key
+        # memoryviews index and slice to plain ints, quicker than the arrays
+        self.contactOffsets = memoryview(self.adjacency.offsets)
+        self.contactIndices = memoryview(self.adjacency.indices)
 
-def getExposureResult(hasPpe):
-    if hasPpe:
-        protection = ppeProtection
-    else:
-        protection = 0
+    def getColleagues(self, nurse):
+        colleagues = self.hospital.nurseColleagues[nurse]
+        if len(colleagues) < 1:
+            raise ValueError("Unexpected number of colleagues")
+        else:
+            return colleagues
+
+    def findNurse(self, patient, strike):
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            start = perf_counter()
+        if strike or not self.hospital.assignNurse(patient):
+            patient.die()
+            if instrumentation is not None:
+                instrumentation.nurseRejections += 1
+        if instrumentation is not None:
+            instrumentation.seconds["nurseAssignment"] += perf_counter() - start
+
+    def getInfectionChance(self, hasPpe):
+        if hasPpe:
+            protection = self.ppeProtection
+        else:
+            protection = 0
+        return self.infectiousness * (1 - protection)
 
-    if random() < infectiousness * (1 - protection):
-        if random() < proportionSevere:
-            if random() < proportionSevereCritical:
+    def getSeverity(self):
+        if self.random() < self.proportionSevere:
+            if self.random() < self.proportionSevereCritical:
                 return Severity.INV_VENT
             else:
                 return Severity.NONINV_VENT
         else:
             return Severity.MILD
-    else:
-        return None
 
-def expose(person, newlyInfected, strike, hasPpe):
-    if person.infectionDay == None and not person.isDead() and not person.isRecovered():
-        if isinstance(person, Nurse):
-            exposureResult = getExposureResult(hasPpe)
+    def getExposureResult(self, hasPpe):
+        if self.random() < self.getInfectionChance(hasPpe):
+            return self.getSeverity()
         else:
-            exposureResult = getExposureResult(False)
+            return None
+
+    def expose(self, person, newlyInfected, strike, hasPpe):
+        if person.infectionDay == None and not person.isDead() and not person.isRecovered():
+            if self.instrumentation is not None:
+                self.instrumentation.exposures += 1
+
+            # same draws as getExposureResult(), without the call for the
+            # large majority of exposures that don't infect
+            if isinstance(person, Nurse):
+                infectionChance = self.getInfectionChance(hasPpe)
+            else:
+                infectionChance = self.infectiousness
 
-        if exposureResult is not None:
-            person.infect(exposureResult)
-            newlyInfected.append(person)
+            if self.random() < infectionChance:
+                self.infectExposed(person, newlyInfected, strike)
 
-            if exposureResult is not Severity.MILD:
+    def infectExposed(self, person, newlyInfected, strike):
+        # an exposure that infected: severity, then the hospital
+        instrumentation = self.instrumentation
+        exposureResult = self.getSeverity()
+        person.infect(exposureResult)
+        newlyInfected.append(person)
+        if instrumentation is not None:
+            instrumentation.infections += 1
 
-                if exposureResult is Severity.INV_VENT and not hospital.assignIcuBed(person):
+        if exposureResult is not Severity.MILD:
+
+            if exposureResult is Severity.INV_VENT:
+                if instrumentation is not None:
+                    start = perf_counter()
+                if not self.hospital.assignIcuBed(person):
                     person.die()
+                    if instrumentation is not None:
+                        instrumentation.icuRejections += 1
+                if instrumentation is not None:
+                    instrumentation.seconds["icuAssignment"] += perf_counter() - start
 
-                if isinstance(person, Nurse):
-                    for patient in person.patients.copy():
-                        patient.releaseNurse()
-                        findNurse(patient, strike)
-                    person.patients = []
+            if isinstance(person, Nurse):
+                if instrumentation is not None:
+                    start = perf_counter()
+                    instrumentation.nurseReassignments += len(person.patients)
+                for patient in self.hospital.releasePatients(person):
+                    self.findNurse(patient, strike)
+                if instrumentation is not None:
+                    instrumentation.seconds["nurseReassignment"] += perf_counter() - start
 
-                if not person.isDead():
-                    findNurse(person, strike)
+            if not person.isDead():
+                self.findNurse(person, strike)
 
-def spread(strike, hasPpe):
-    newlyInfected = []
-    for person in infected:
-        if not person.isDead() and not person.isSevere() and not person.isRecovered():
-            neighbours = getNeighbours(person)
-            for neighbour in neighbours:
-                expose(neighbour, newlyInfected, strike, hasPpe)
-        if person.nurse != None:
-            expose(person.nurse, newlyInfected, strike, hasPpe)
-        elif isinstance(person, Nurse):
-            colleagues = getColleagues(person)
-            for colleague in colleagues:
-                expose(colleague, newlyInfected, strike, hasPpe)
-        person.progress()
-    infected.extend(newlyInfected)
-        
-def aggregations(df):
-    return df.groupby(["day"]) \
-        .sum()[{"wasInfected", "isDead", "isRecovered", "newlyInfected","newlyInfectedSevere","wasInfectedNurse", "isDeadNurse"}] \
-        .reset_index() \
-        .rename(columns={
-            "day" : "Day",
-            "wasInfected" : "Total Infections",
-            "isDead" : "Total Dead",
-            "isRecovered" : "Total Recovered",
-            "newlyInfected" : "New Infections",
-            "newlyInfectedSevere" : "New Infections Requiring Hospitalization",
-            "wasInfectedNurse" : "Total Nurse Infections",
-            "isDeadNurse" : "Total Nurses Dead"
-    })
-
-def run():
-    data = {}
-    initPopulation()
-    collectData(data, 1)
-    for i in range(1, totalDays):
-        spread(i <= strikeDays, i >= ppeArrivalDay)
-        collectData(data, i + 1)
-    return pd.DataFrame(data=data)
+    def spread(self, strike, hasPpe):
+        self.day += 1
+        newlyInfected = []
+        for person in self.active:
+            if not person.isDead() and not person.isSevere() and not person.isRecovered():
+                neighbours = self.getNeighbours(person)
+                for neighbour in neighbours:
+                    self.expose(neighbour, newlyInfected, strike, hasPpe)
+            if person.nurse != None:
+                self.expose(person.nurse, newlyInfected, strike, hasPpe)
+            elif isinstance(person, Nurse):
+                colleagues = self.getColleagues(person)
+                for colleague in colleagues:
+                    self.expose(colleague, newlyInfected, strike, hasPpe)
+            person.progress()
+        for person in newlyInfected:
+            self.activate(person, self.day)
+        self.infected.extend(newlyInfected)
+        self.retire(self.day)
 
-def collectData(data, day):
-    if data.get("day", None) is None:
-        data["day"] = []
-        data["id"] = []
-        data["legend"] = []
-        data["x"] = []
-        data["y"] = []
-        data["isNurse"] = []
-        data["severity"] = []
-        data["isDead"] = []
-        data["isRecovered"] = []
-        data["wasInfected"] = []
-        data["newlyInfected"] = []
-        data["newlyInfectedSevere"] = []
-        data["wasInfectedNurse"] = []
-        data["isDeadNurse"] = []
-    for person in people:
-        data["day"].append(day)
-        data["id"].append(str(person))
-        data["legend"].append(legend(person)) 
-        data["x"].append(person.position.x)  
-        data["y"].append(person.position.y)  
-        data["isNurse"].append(isinstance(person,Nurse))
-        if person.severity is None:
-            severityValue = "N/A"
+    def activate(self, person, day):
+        self.active[person] = None
+        if self.recoveryTime >= 1:
+            self.resolutions.setdefault(day + self.recoveryTime, []).append(person)
+
+    def retire(self, day):
+        # people who recovered or died today only ever call progress() again,
+        # except nurses, who keep exposing their colleagues until all are infected
+        for person in self.resolutions.pop(day, []):
+            if isinstance(person, Nurse) and any(colleague.infectionDay is None for colleague in self.getColleagues(person)):
+                self.resolutions.setdefault(day + 1, []).append(person)
+            else:
+                del self.active[person]
+
+    def step(self):
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            self.spread(self.day <= self.strikeDays, self.day >= self.ppeArrivalDay)
         else:
-            severityValue = person.severity.value
-        data["severity"].append(severityValue)
-        data["isDead"].append(person.isDead())
-        data["isRecovered"].append(person.isRecovered())
-        data["wasInfected"].append(person.outcome is not Outcome.UNINFECTED)
-        data["newlyInfected"].append(person.infectionDay == 1)
-        data["newlyInfectedSevere"].append(person.infectionDay == 1 and person.isSevere())
-        data["wasInfectedNurse"].append(isinstance(person,Nurse) and person.outcome is not Outcome.UNINFECTED)
-        data["isDeadNurse"].append(isinstance(person,Nurse) and person.isDead())
+            instrumentation.beginDay(self.day + 1)
+            start = perf_counter()
+            self.spread(self.day <= self.strikeDays, self.day >= self.ppeArrivalDay)
+            instrumentation.seconds["spread"] += perf_counter() - start
 
-def getTotalIcuBeds():
-    return max(1, round(populationSize * icuBedsPerHundredThousand/100000))
+    def resetHistory(self):
+        # the totals of every day collected so far, for polling a run as it goes
+        self.history = newTotals(self.totalDays)
+        self.historyDays = []
 
-width = 64
-height = math.floor(populationSize / width)
-hospital = Hospital(getTotalIcuBeds())
-people = []
-infected = []
+    def record(self):
+        # totalDays can be raised when a run is branched from a checkpoint
+        capacity = len(self.history["day"])
+        if self.day > capacity:
+            grown = newTotals(max(self.day, 2 * capacity))
+            for column, values in self.history.items():
+                grown[column][:capacity] = values
+            self.history = grown
+        if len(self.historyDays) == 0 or self.historyDays[-1] != self.day:
+            self.historyDays.append(self.day)
+        self.tally.write(self.history, self.day)
 
-def isToBeNurse(i):
-    if ratioNursesInPopulation == 0:
-        return False
-    else:
+    def liveAggregations(self):
+        # O(days): the aggregations() of the days collected so far
+        import pandas as pd
+        if len(self.historyDays) == 0:
+            return pd.DataFrame(columns=list(aggregationColumns.values()))
+        first = self.historyDays[0] - 1
+        last = self.historyDays[-1]
+        data = {column: values[first:last].copy() for column, values in self.history.items()}
+        return pd.DataFrame(data=data).rename(columns=aggregationColumns)
+
+    def collect(self, collector, *args):
+        self.record()
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            return collector(*args)
+        start = perf_counter()
+        collected = collector(*args)
+        instrumentation.seconds["collect"] += perf_counter() - start
+        instrumentation.endDay()
+        return collected
+
+    def beginRun(self):
+        if self.instrumentation is not None:
+            self.instrumentation.beginDay(self.day)
+
+    def isFinished(self):
+        return self.day >= self.totalDays
+
+    def run(self, seed=None, instrumentation=None):
+        if seed is not None:
+            self.seed(seed)
+        self.instrumentation = instrumentation
+        self.initPopulation()
+        return self.resume()
+
+    def resume(self):
+        import pandas as pd
+        self.data = {}
+        self.beginRun()
+        self.collect(self.collectData, self.data, self.day)
+        while not self.isFinished():
+            self.step()
+            self.collect(self.collectData, self.data, self.day)
+        return pd.DataFrame(data=self.data)
+
+    def runToParquet(self, path, seed=None, instrumentation=None):
+        if seed is not None:
+            self.seed(seed)
+        self.instrumentation = instrumentation
+        self.initPopulation()
+        return self.resumeToParquet(path)
+
+    def resumeToParquet(self, path):
+        sink = ParquetSink(path)
+        self.beginRun()
+        try:
+            sink.write(self.collect(self.collectDay))
+            while not self.isFinished():
+                self.step()
+                sink.write(self.collect(self.collectDay))
+        finally:
+            sink.close()
+        return path
+
+    def collectDay(self):
+        data = {}
+        self.collectData(data, self.day)
+        return data
+
+    def runDays(self, seed=None, instrumentation=None):
+        if seed is not None:
+            self.seed(seed)
+        self.instrumentation = instrumentation
+        self.initPopulation()
+        return self.resumeDays()
+
+    def resumeDays(self):
+        # nothing is simulated past the day last asked for, so a consumer
+        # that stops iterating stops the run
+        self.beginRun()
+        yield self.collect(self.dayRecord)
+        while not self.isFinished():
+            self.step()
+            yield self.collect(self.dayRecord)
+
+    async def runDaysAsync(self, seed=None, instrumentation=None):
+        # one day at a time, giving the event loop a turn after every day;
+        # cancelling the consuming task stops the run at the next day
+        import asyncio
+        for record in self.runDays(seed, instrumentation):
+            yield record
+            await asyncio.sleep(0)
+
+    def dayRecord(self):
+        # the aggregations() row of today, as collected by collect()
+        row = self.day - 1
+        return {aggregationColumns[column]: int(values[row]) for column, values in self.history.items()}
+
+    def runRasters(self, seed=None):
+        if seed is not None:
+            self.seed(seed)
+        self.initPopulation()
+        return self.resumeRasters()
+
+    def resumeRasters(self):
+        yield self.day, self.raster()
+        while not self.isFinished():
+            self.step()
+            yield self.day, self.raster()
+
+    def raster(self):
+        # everyone not in the infected list has the legend code of day one
+        rows = math.ceil(self.populationSize / self.width)
+        key = (self.populationSize, self.width, self.ratioNursesInPopulation)
+        if getattr(self, "rasterKey", None) != key:
+            self.rasterBase = np.full(rows * self.width, NO_PERSON, dtype=np.uint8)
+            self.rasterBase[:self.populationSize] = 0
+            self.rasterBase[np.fromiter(self.nurseIndices(), dtype=np.int64)] = 1
+            self.rasterKey = key
+        raster = self.rasterBase.copy()
+        width = self.width
+        for person in self.infected:
+            raster[person.position.y * width + person.position.x] = legendCode(person)
+        return raster.reshape(rows, width)
+
+    def runAggregations(self, snapshotDays=(), seed=None, instrumentation=None):
+        if seed is not None:
+            self.seed(seed)
+        self.instrumentation = instrumentation
+        self.initPopulation()
+        return self.resumeAggregations(snapshotDays)
+
+    def resumeAggregations(self, snapshotDays=()):
+        import pandas as pd
+        firstDay = self.day
+        self.totals = newTotals(self.totalDays)
+        self.snapshot = {}
+        self.beginRun()
+        self.collect(self.collectTotals, self.totals, self.snapshot, self.day, snapshotDays)
+        while not self.isFinished():
+            self.step()
+            self.collect(self.collectTotals, self.totals, self.snapshot, self.day, snapshotDays)
+        df = pd.DataFrame(data=self.totals).iloc[firstDay - 1:].reset_index(drop=True)
+        return df.rename(columns=aggregationColumns), snapshotFrame(self.snapshot)
+
+    def saveCheckpoint(self, path):
+        if self.randomStream is None:
+            raise ValueError("Only simulations drawing from a RandomStream can be checkpointed")
+        # a chunked population only indexes the people it materialized, the
+        # cells never reached are left uninfected in the arrays
+        if self.tileSize is None:
+            index = {person: i for i, person in enumerate(self.people)}
+        else:
+            index = {person: i for i, person in self.people.items()}
+        outcomes = list(Outcome)
+        severities = [None] + list(Severity)
+        outcome = np.zeros(self.populationSize, dtype=np.uint8)
+        severity = np.zeros(self.populationSize, dtype=np.uint8)
+        infectionDay = np.zeros(self.populationSize, dtype=np.int32)
+        isNurse = np.zeros(self.populationSize, dtype=bool)
+        for person, i in index.items():
+            outcome[i] = outcomes.index(person.outcome)
+            severity[i] = severities.index(person.severity)
+            infectionDay[i] = person.infectionDay or 0
+            isNurse[i] = isinstance(person, Nurse)
+        patientOf = []
+        patients = []
+        for nurse in self.hospital.nurses:
+            for patient in nurse.patients:
+                patientOf.append(index[nurse])
+                patients.append(index[patient])
+        resolutionDays = []
+        resolutionPeople = []
+        for day, scheduled in self.resolutions.items():
+            for person in scheduled:
+                resolutionDays.append(day)
+                resolutionPeople.append(index[person])
+        header = {
+            "parameters": {name: getattr(self, name) for name in parameterNames},
+            "width": self.width,
+            "height": self.height,
+            "day": self.day,
+            "head": self.hospital.head,
+            "assignments": self.hospital.assignments,
+            "random": self.randomStream.getState(),
+            "icuRecordedDay": self.hospital.occupiedBeds.recordedDay
+        }
+        # a named topology is rebuilt on restore, a custom one is saved
+        if isinstance(self.topology, Adjacency):
+            header["topology"] = None
+            contactOffsets = self.topology.offsets
+            contactIndices = self.topology.indices
+        else:
+            header["topology"] = self.topology
+            contactOffsets = np.zeros(0, dtype=np.int32)
+            contactIndices = np.zeros(0, dtype=np.int32)
+        np.savez_compressed(path,
+            header=np.array(json.dumps(header)),
+            outcome=outcome,
+            severity=severity,
+            infectionDay=infectionDay,
+            isNurse=isNurse,
+            infected=np.array([index[person] for person in self.infected], dtype=np.int32),
+            active=np.array([index[person] for person in self.active], dtype=np.int32),
+            resolutionDays=np.array(resolutionDays, dtype=np.int32),
+            resolutionPeople=np.array(resolutionPeople, dtype=np.int32),
+            nurses=np.array([index[nurse] for nurse in self.hospital.nurses], dtype=np.int32),
+            ring=np.array([index[nurse] for nurse in self.hospital.ring], dtype=np.int32),
+            patientOf=np.array(patientOf, dtype=np.int32),
+            patients=np.array(patients, dtype=np.int32),
+            occupiedBeds=np.array([index[patient] for patient in self.hospital.occupiedBeds], dtype=np.int32),
+            icuDaily=self.hospital.occupiedBeds.daily,
+            nonNursePatientDays=np.array([entry[0] for entry in self.hospital.nonNursePatients], dtype=np.int32),
+            nonNursePatientOrder=np.array([entry[1] for entry in self.hospital.nonNursePatients], dtype=np.int64),
+            nonNursePatients=np.array([index[entry[2]] for entry in self.hospital.nonNursePatients], dtype=np.int32),
+            contactOffsets=contactOffsets,
+            contactIndices=contactIndices)
+
+    def loadCheckpoint(self, path):
+        with np.load(path) as checkpoint:
+            self.restoreCheckpoint(checkpoint)
+
+    def restoreCheckpoint(self, checkpoint):
+        header = json.loads(str(checkpoint["header"]))
+        self.configure(header["parameters"], header["width"], header["height"])
+        self.randomStream = RandomStream()
+        self.randomStream.setState(header["random"])
+        self.random = self.randomStream.random
+        self.day = header["day"]
+        topology = header.get("topology", "vonNeumann")
+        if topology is None:
+            topology = Adjacency(checkpoint["contactOffsets"], checkpoint["contactIndices"])
+        self.topology = topology
+        self.buildAdjacency()
+        self.resetPeople()
+        self.infected.clear()
+        self.active.clear()
+        self.resolutions.clear()
+        self.hospital.reset(self.getTotalIcuBeds())
+
+        outcomes = list(Outcome)
+        severities = [None] + list(Severity)
+        prevNurse = None
+        if self.tileSize is None:
+            for i, isNurse in enumerate(checkpoint["isNurse"].tolist()):
+                position = Position(i % self.width, math.floor(i / self.width))
+                if isNurse:
+                    person = Nurse(position, self)
+                    self.addColleague(person, prevNurse)
+                    prevNurse = person
+                else:
+                    person = Person(position, self)
+                self.people.append(person)
+            touched = range(len(self.people))
+        else:
+            for i in np.flatnonzero(checkpoint["isNurse"]).tolist():
+                person = self.people.addNurse(i)
+                self.addColleague(person, prevNurse)
+                prevNurse = person
+            touched = np.flatnonzero(checkpoint["outcome"]).tolist()
+
+        people = self.people
+        outcome = checkpoint["outcome"]
+        severity = checkpoint["severity"]
+        infectionDay = checkpoint["infectionDay"]
+        for i in touched:
+            person = people[i]
+            person.outcome = outcomes[outcome[i]]
+            person.severity = severities[severity[i]]
+            person.infectionDay = int(infectionDay[i]) or None
+        self.infected.extend(people[i] for i in checkpoint["infected"].tolist())
+        for i in checkpoint["active"].tolist():
+            self.active[people[i]] = None
+        for day, i in zip(checkpoint["resolutionDays"].tolist(), checkpoint["resolutionPeople"].tolist()):
+            self.resolutions.setdefault(day, []).append(people[i])
+
+        # nurses are looked up without allocating the tiles they sit in
+        nurseAt = people.__getitem__ if self.tileSize is None else people.nurses.__getitem__
+        self.hospital.nurses.extend(nurseAt(i) for i in checkpoint["nurses"].tolist())
+        for nurse, patient in zip(checkpoint["patientOf"].tolist(), checkpoint["patients"].tolist()):
+            nurseAt(nurse).patients.append(people[patient])
+            people[patient].nurse = nurseAt(nurse)
+        beds = self.hospital.occupiedBeds
+        for i in checkpoint["occupiedBeds"].tolist():
+            beds.admit(people[i], isinstance(people[i], Nurse), self.day)
+        if "icuDaily" in checkpoint:
+            beds.daily = checkpoint["icuDaily"].copy()
+            beds.recordedDay = header["icuRecordedDay"]
+        self.hospital.indexNurses([nurseAt(i) for i in checkpoint["ring"].tolist()])
+        self.hospital.head = header["head"]
+        self.hospital.assignments = header["assignments"]
+        self.hospital.nonNursePatients = [(day, order, people[i]) for day, order, i in zip(checkpoint["nonNursePatientDays"].tolist(),
+            checkpoint["nonNursePatientOrder"].tolist(), checkpoint["nonNursePatients"].tolist())]
+        self.tally.recount(self.infected)
+        self.resetHistory()
+
+    def collectTotals(self, totals, snapshot, day, snapshotDays=()):
+        self.tally.write(totals, day)
+        if day in snapshotDays:
+            self.collectData(snapshot, day)
+
+    def collectData(self, data, day):
+        if data.get("day", None) is None:
+            data["day"] = []
+            data["id"] = []
+            data["legend"] = []
+            data["x"] = []
+            data["y"] = []
+            data["isNurse"] = []
+            data["severity"] = []
+            data["isDead"] = []
+            data["isRecovered"] = []
+            data["wasInfected"] = []
+            data["newlyInfected"] = []
+            data["newlyInfectedSevere"] = []
+            data["wasInfectedNurse"] = []
+            data["isDeadNurse"] = []
+            data["isInIcu"] = []
+        occupiedBeds = self.hospital.occupiedBeds
+        for person in self.people:
+            isNurse = isinstance(person, Nurse)
+            outcome = person.outcome
+            wasInfected = outcome is not Outcome.UNINFECTED
+            isDead = outcome is Outcome.DEAD
+            newlyInfected = person.infectionDay == 1
+            position = person.position
+            data["day"].append(day)
+            data["id"].append(str(position))
+            data["legend"].append(legend(person))
+            data["x"].append(position.x)
+            data["y"].append(position.y)
+            data["isNurse"].append(isNurse)
+            if person.severity is None:
+                severityValue = "N/A"
+            else:
+                severityValue = person.severity.value
+            data["severity"].append(severityValue)
+            data["isDead"].append(isDead)
+            data["isRecovered"].append(outcome is Outcome.RECOVERED)
+            data["wasInfected"].append(wasInfected)
+            data["newlyInfected"].append(newlyInfected)
+            data["newlyInfectedSevere"].append(newlyInfected and person.isSevere())
+            data["wasInfectedNurse"].append(isNurse and wasInfected)
+            data["isDeadNurse"].append(isNurse and isDead)
+            data["isInIcu"].append(person in occupiedBeds)
+
+    def getTotalIcuBeds(self):
+        return max(1, round(self.populationSize * self.icuBedsPerHundredThousand/100000))
+
+    def isToBeNurse(self, i):
+        if self.ratioNursesInPopulation == 0:
+            return False
+        else:
+            divisor = 3
+            peoplePerNurse = 1/self.ratioNursesInPopulation
+            for n in range(divisor):
+                if i % divisor == n and i % round(peoplePerNurse) == round(peoplePerNurse * n/divisor):
+                    return True
+            return False
+
+    def nurseIndices(self, blockSize=1 << 20):
+        # the same people as isToBeNurse(), a block of indices at a time
+        if self.ratioNursesInPopulation == 0:
+            return
         divisor = 3
-        peoplePerNurse = 1/ratioNursesInPopulation
-        for n in range(divisor):
-            if i % divisor == n and i % round(peoplePerNurse) == round(peoplePerNurse * n/divisor):
-                return True 
-        return False
-    #return ratioNursesInPopulation != 0 and ( \
-     #   i % 3 == 0 and i % round(1/ratioNursesInPopulation) == 0 \
-      #  or i % 3 == 1 and i % round(1/ratioNursesInPopulation) == round(1/ratioNursesInPopulation*1/3) \
-       # or i % 3 == 2 and i % round(1/ratioNursesInPopulation) == round(1/ratioNursesInPopulation*2/3) \
-    #)
+        peoplePerNurse = 1/self.ratioNursesInPopulation
+        for start in range(0, self.populationSize, blockSize):
+            i = np.arange(start, min(start + blockSize, self.populationSize))
+            mask = np.zeros(len(i), dtype=bool)
+            for n in range(divisor):
+                mask |= (i % divisor == n) & (i % round(peoplePerNurse) == round(peoplePerNurse * n/divisor))
+            yield from i[mask].tolist()
 
-def initPopulation():
-    people.clear()
-    infected.clear()
-    hospital.reset(getTotalIcuBeds())
-    prevNurse = None
+    def addColleague(self, nurse, prevNurse):
+        self.hospital.nurseColleagues[nurse] = []
+        if prevNurse is not None:
+            self.hospital.nurseColleagues[nurse].append(prevNurse)
+            self.hospital.nurseColleagues[prevNurse].append(nurse)
+
+    def resetPeople(self):
+        if self.tileSize is None:
+            self.people.clear()
+        else:
+            self.people = ChunkedPopulation(self, self.tileSize)
 
-    for i in range(0, populationSize):
-        position = Position(i % width, math.floor(i / width))
+    def initPopulation(self):
+        self.day = 1
+        self.tally.reset()
+        self.resetHistory()
+        self.buildAdjacency()
+        self.resetPeople()
+        self.infected.clear()
+        self.active.clear()
+        self.resolutions.clear()
+        self.hospital.reset(self.getTotalIcuBeds())
+        prevNurse = None
 
-        if isToBeNurse(i):
-            person = Nurse(position)
-            hospital.nurseColleagues[person] = []
+        if self.tileSize is not None:
+            self.initChunkedPopulation()
+            return
 
-            if prevNurse is not None:
-                # add previous nurse as colleague of current nurse
-                hospital.nurseColleagues[person].append(prevNurse)
-                # add current nurse as colleague of previous nurse
-                hospital.nurseColleagues[prevNurse].append(person)
+        for i in range(0, self.populationSize):
+            position = Position(i % self.width, math.floor(i / self.width))
 
-            prevNurse = person
+            if self.isToBeNurse(i):
+                person = Nurse(position, self)
+                self.hospital.nurseColleagues[person] = []
+
+                if prevNurse is not None:
+                    # add previous nurse as colleague of current nurse
+                    self.hospital.nurseColleagues[person].append(prevNurse)
+                    # add current nurse as colleague of previous nurse
+                    self.hospital.nurseColleagues[prevNurse].append(person)
+
+                prevNurse = person
+
+                if i % 2 == 0:
+                    self.hospital.nurses.append(person)
+                else:
+                    self.hospital.nurses.appendleft(person)
+            else:
+                person = Person(position, self)
+            if i == math.floor(self.populationSize / 2) + math.floor(self.width / 2) :
+                person.infect(Severity.MILD)
+                self.activate(person, self.day)
+                self.infected.append(person)
+            self.people.append(person)
+        self.hospital.indexNurses()
 
+    def initChunkedPopulation(self):
+        prevNurse = None
+        for i in self.nurseIndices():
+            nurse = self.people.addNurse(i)
+            self.addColleague(nurse, prevNurse)
+            prevNurse = nurse
             if i % 2 == 0:
-                hospital.nurses.append(person)
+                self.hospital.nurses.append(nurse)
             else:
-                hospital.nurses.appendleft(person)
-        else:
-            person = Person(position)
-        if i == math.floor(populationSize / 2) + math.floor(width / 2) :
+                self.hospital.nurses.appendleft(nurse)
+        seed = math.floor(self.populationSize / 2) + math.floor(self.width / 2)
+        if seed < self.populationSize:
+            person = self.people[seed]
             person.infect(Severity.MILD)
-            infected.append(person)
-        people.append(person)
+            self.activate(person, self.day)
+            self.infected.append(person)
+        self.hospital.indexNurses()
+
+# Functions
+
+# The module-level functions below run the default simulation, which takes
+# its parameters from the module globals whenever a run is started, and
+# draws from the global random module unless the run is given a seed.
+
+def useModuleParameters(seed=None):
+    defaultSimulation.configure(getParameters(), width, height)
+    if seed is None:
+        defaultSimulation.random = random
+        defaultSimulation.randomStream = None
+    else:
+        defaultSimulation.seed(seed)
+    return defaultSimulation
+
+def validCoordinate(x, y):
+    return defaultSimulation.validCoordinate(x, y)
+
+def getNeighbours(person):
+    return defaultSimulation.getNeighbours(person)
+
+def getColleagues(nurse):
+    return defaultSimulation.getColleagues(nurse)
+
+def findNurse(patient, strike):
+    defaultSimulation.findNurse(patient, strike)
+
+def getExposureResult(hasPpe):
+    return defaultSimulation.getExposureResult(hasPpe)
+
+def expose(person, newlyInfected, strike, hasPpe):
+    defaultSimulation.expose(person, newlyInfected, strike, hasPpe)
+
+def spread(strike, hasPpe):
+    defaultSimulation.spread(strike, hasPpe)
+
+aggregationColumns = {
+    "day" : "Day",
+    "wasInfected" : "Total Infections",
+    "isDead" : "Total Dead",
+    "isRecovered" : "Total Recovered",
+    "newlyInfected" : "New Infections",
+    "newlyInfectedSevere" : "New Infections Requiring Hospitalization",
+    "wasInfectedNurse" : "Total Nurse Infections",
+    "isDeadNurse" : "Total Nurses Dead",
+    "isInIcu" : "ICU Occupancy"
+}
+
+def aggregations(df):
+    if isinstance(df, (str, os.PathLike)):
+        return aggregationsFromParquet(df)
+    columns = [column for column in aggregationColumns if column != "day"]
+    return df.groupby(["day"])[columns] \
+        .sum() \
+        .reset_index() \
+        .rename(columns=aggregationColumns)
+
+def aggregationsFromParquet(path):
+    # one row group at a time, reading only the aggregated columns
+    import pandas as pd
+    import pyarrow.parquet as pq
+    parquetFile = pq.ParquetFile(path)
+    frames = []
+    for i in range(parquetFile.num_row_groups):
+        rowGroup = parquetFile.read_row_group(i, columns=list(aggregationColumns)).to_pandas()
+        frames.append(aggregations(rowGroup))
+    return pd.concat(frames).groupby("Day").sum().reset_index()
+
+def readDay(path, day):
+    import pyarrow.parquet as pq
+    return pq.read_table(path, filters=[("day", "==", day)]).to_pandas()
+
+def run(seed=None, instrumentation=None):
+    return useModuleParameters(seed).run(instrumentation=instrumentation)
+
+def runAggregations(snapshotDays=(), seed=None, instrumentation=None):
+    return useModuleParameters(seed).runAggregations(snapshotDays, instrumentation=instrumentation)
+
+def runToParquet(path, seed=None, instrumentation=None):
+    return useModuleParameters(seed).runToParquet(path, instrumentation=instrumentation)
+
+def runRasters(seed=None):
+    return useModuleParameters(seed).runRasters()
+
+def runDays(seed=None, instrumentation=None):
+    return useModuleParameters(seed).runDays(instrumentation=instrumentation)
+
+def runDaysAsync(seed=None, instrumentation=None):
+    # all module-level runs share the default simulation; concurrent runs
+    # each need a Simulation of their own
+    return useModuleParameters(seed).runDaysAsync(instrumentation=instrumentation)
+
+def newTotals(days):
+    totals = {}
+    for column in aggregationColumns:
+        totals[column] = np.zeros(days, dtype=np.int64)
+    return totals
+
+def collectTotals(totals, snapshot, day, snapshotDays=()):
+    defaultSimulation.collectTotals(totals, snapshot, day, snapshotDays)
+
+def snapshotFrame(snapshot):
+    import pandas as pd
+    if len(snapshot) == 0:
+        return None
+    df = pd.DataFrame(data=snapshot)
+    df["legend"] = df["legend"].astype("category")
+    df["severity"] = df["severity"].astype("category")
+    return df
+
+def collectData(data, day):
+    defaultSimulation.collectData(data, day)
+
+def liveAggregations():
+    return defaultSimulation.liveAggregations()
+
+def loadCheckpoint(path, parameters=None):
+    simulation = Simulation()
+    simulation.loadCheckpoint(path)
+    if parameters is not None:
+        simulation.override(parameters)
+    return simulation
+
+def getParameters():
+    return {name: globals()[name] for name in parameterNames}
+
+def setParameters(parameters):
+    global height
+    for name, value in parameters.items():
+        if name not in parameterNames:
+            raise ValueError("Unknown parameter", name)
+        globals()[name] = value
+    height = math.floor(populationSize / width)
+
+def getTotalIcuBeds():
+    return useModuleParameters().getTotalIcuBeds()
+
+width = 64
+height = math.floor(populationSize / width)
+defaultSimulation = Simulation(width=width, height=height, random=random)
+hospital = defaultSimulation.hospital
+people = defaultSimulation.people
+infected = defaultSimulation.infected
+active = defaultSimulation.active
+resolutions = defaultSimulation.resolutions
+
+def isToBeNurse(i):
+    return useModuleParameters().isToBeNurse(i)
+
+def initPopulation():
+    useModuleParameters().initPopulation()
 
 def legend(person):
 
@@ -428,9 +1662,160 @@ def styleMarker(datum):
             datum.marker.color = "lightskyblue"
 
 def showSpread(df, day):
-    dfDay = df[df["day"] == day]
+    import plotly.express as px
+    if isinstance(df, (str, os.PathLike)):
+        dfDay = readDay(df, day)
+    else:
+        dfDay = df[df["day"] == day]
     fig = px.scatter(dfDay, x="x", y="y", color="legend")
     for d in fig['data']:
         styleMarker(d)
     fig.show()
 
+# Rasters: one uint8 legend code per grid cell and day, row y at index y.
+# Codes go up with how far along a case is, nurses one above regular people,
+# so the highest code of a block is the one worth showing when scaled down.
+
+legendStates = [Outcome.UNINFECTED, Outcome.RECOVERED, Severity.MILD, Severity.NONINV_VENT, Severity.INV_VENT, Outcome.DEAD]
+legendNames = [label + " " + state.value for state in legendStates for label in (Person.label, Nurse.label)]
+stateCodes = {state: 2 * i for i, state in enumerate(legendStates)}
+NO_PERSON = 255
+
+# the CSS colours styleMarker() uses, for writing images
+colorValues = {
+    "orange": (255, 165, 0),
+    "purple": (128, 0, 128),
+    "red": (255, 0, 0),
+    "white": (255, 255, 255),
+    "green": (0, 128, 0),
+    "blue": (0, 0, 255),
+    "navajowhite": (255, 222, 173),
+    "mediumpurple": (147, 112, 219),
+    "darksalmon": (233, 150, 122),
+    "black": (0, 0, 0),
+    "lightgreen": (144, 238, 144),
+    "lightskyblue": (135, 206, 250)
+}
+
+def legendCode(person):
+    if person.outcome is Outcome.INFECTED:
+        code = stateCodes[person.severity]
+    else:
+        code = stateCodes[person.outcome]
+    if isinstance(person, Nurse):
+        code += 1
+    return code
+
+def legendColors():
+    import plotly.graph_objects as go
+    colors = []
+    for name in legendNames:
+        datum = go.Scatter(name=name)
+        styleMarker(datum)
+        colors.append(datum.marker.color)
+    return colors
+
+def spreadRasters(df):
+    # the rasters of a run() frame or of a Parquet file written by
+    # runToParquet(), a day at a time
+    import pandas as pd
+    if isinstance(df, (str, os.PathLike)):
+        import pyarrow.parquet as pq
+        parquetFile = pq.ParquetFile(df)
+        days = (parquetFile.read_row_group(i, columns=["day", "x", "y", "legend"]).to_pandas()
+            for i in range(parquetFile.num_row_groups))
+    else:
+        days = (dfDay for day, dfDay in df.groupby("day", sort=True))
+    shape = None
+    for dfDay in days:
+        x = dfDay["x"].to_numpy()
+        y = dfDay["y"].to_numpy()
+        if shape is None:
+            shape = (int(y.max()) + 1, int(x.max()) + 1)
+        codes = pd.Categorical(dfDay["legend"].astype(str), categories=legendNames).codes
+        raster = np.full(shape, NO_PERSON, dtype=np.uint8)
+        raster[y, x] = np.where(codes < 0, NO_PERSON, codes)
+        yield int(dfDay["day"].iloc[0]), raster
+
+def poolRaster(raster, maxSide):
+    # blocks of cells down to at most maxSide a side, keeping the highest code
+    scale = math.ceil(max(raster.shape) / maxSide)
+    if scale <= 1:
+        return raster.copy()
+    rows = math.ceil(raster.shape[0] / scale) * scale
+    columns = math.ceil(raster.shape[1] / scale) * scale
+    padded = np.full((rows, columns), -1, dtype=np.int16)
+    padded[:raster.shape[0], :raster.shape[1]] = np.where(raster == NO_PERSON, -1, raster)
+    pooled = padded.reshape(rows // scale, scale, columns // scale, scale).max(axis=(1, 3))
+    return np.where(pooled < 0, NO_PERSON, pooled).astype(np.uint8)
+
+def animateSpread(rasters, maxSide=256):
+    # codes stay uint8, so the frames are written as compact typed arrays;
+    # cells without anyone are shown through one transparent code past the legend
+    import plotly.graph_objects as go
+    colors = legendColors() + ["rgba(0,0,0,0)"]
+    colorscale = []
+    for code, color in enumerate(colors):
+        colorscale.append([code / len(colors), color])
+        colorscale.append([(code + 1) / len(colors), color])
+    colorbar = dict(tickvals=list(range(len(legendNames))), ticktext=legendNames)
+
+    frames = []
+    for day, raster in rasters:
+        z = poolRaster(raster, maxSide)
+        z[z == NO_PERSON] = len(legendNames)
+        frames.append(go.Frame(data=[go.Heatmap(z=z)], name=str(day)))
+    heatmap = go.Heatmap(z=frames[0].data[0].z, colorscale=colorscale, zmin=-0.5, zmax=len(colors) - 0.5, colorbar=colorbar)
+    steps = [dict(method="animate", label=frame.name,
+        args=[[frame.name], dict(mode="immediate", frame=dict(duration=0, redraw=True))]) for frame in frames]
+    play = dict(label="Play", method="animate", args=[None, dict(frame=dict(duration=100, redraw=True), fromcurrent=True)])
+    layout = go.Layout(
+        updatemenus=[dict(type="buttons", buttons=[play])],
+        sliders=[dict(steps=steps, currentvalue=dict(prefix="Day "))],
+        yaxis=dict(scaleanchor="x"))
+    return go.Figure(data=[heatmap], frames=frames, layout=layout)
+
+def palette():
+    values = [colorValues[color] for color in legendColors()]
+    return values + [(0, 0, 0)] * (NO_PERSON + 1 - len(values))
+
+def pngChunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+def writePng(path, raster, scale=1, colors=None):
+    # an indexed PNG with the legend colours, row 0 at the bottom like showSpread()
+    if colors is None:
+        colors = palette()
+    image = np.repeat(np.repeat(raster[::-1], scale, axis=0), scale, axis=1)
+    rows = np.zeros((image.shape[0], image.shape[1] + 1), dtype=np.uint8)
+    rows[:, 1:] = image
+    alpha = bytes([255] * NO_PERSON + [0])
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(pngChunk(b"IHDR", struct.pack(">IIBBBBB", image.shape[1], image.shape[0], 8, 3, 0, 0, 0)))
+        f.write(pngChunk(b"PLTE", bytes(value for color in colors for value in color)))
+        f.write(pngChunk(b"tRNS", alpha))
+        f.write(pngChunk(b"IDAT", zlib.compress(rows.tobytes(), 1)))
+        f.write(pngChunk(b"IEND", b""))
+
+def writeSpreadPngs(rasters, directory, scale=1):
+    os.makedirs(directory, exist_ok=True)
+    colors = palette()
+    paths = []
+    for day, raster in rasters:
+        path = os.path.join(directory, "day{:04d}.png".format(day))
+        writePng(path, raster, scale, colors)
+        paths.append(path)
+    return paths
+
+def writeSpreadGif(rasters, path, scale=1, duration=100):
+    # needs Pillow, which is only imported here
+    from PIL import Image
+    colors = [value for color in palette() for value in color]
+    images = []
+    for day, raster in rasters:
+        image = Image.fromarray(np.repeat(np.repeat(raster[::-1], scale, axis=0), scale, axis=1), mode="P")
+        image.putpalette(colors)
+        images.append(image)
+    images[0].save(path, save_all=True, append_images=images[1:], duration=duration, loop=0, transparency=NO_PERSON)
+    return path
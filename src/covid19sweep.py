@@ -0,0 +1,61 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import covid19sim as sim
+import covid19grid as grid
+
+# Parameter sweeps: every combination in a grid of parameter values is run
+# `replicates` times, each run in its own worker process, since the model
+# keeps its state in covid19sim's module globals.
+
+def runSeed(baseSeed, runIndex):
+    return int(np.random.SeedSequence([baseSeed, runIndex]).generate_state(1)[0])
+
+def expandGrid(parameterGrid):
+    for name in parameterGrid:
+        if name not in sim.parameterNames:
+            raise ValueError("Unknown parameter", name)
+    names = list(parameterGrid)
+    for values in itertools.product(*[parameterGrid[name] for name in names]):
+        yield dict(zip(names, values))
+
+def sweepRuns(parameterGrid, replicates, baseSeed):
+    runIndex = 0
+    for overrides in expandGrid(parameterGrid):
+        for replicate in range(replicates):
+            yield overrides, replicate, runSeed(baseSeed, runIndex)
+            runIndex += 1
+
+def runScenario(parameters, overrides, replicate, seed, engine="object"):
+    # worker processes are reused, so every run starts from the full set of
+    # parameters of the process that started the sweep
+    sim.setParameters(parameters)
+    sim.setParameters(overrides)
+    if engine == "grid":
+        df = sim.aggregations(grid.run(seed))
+    elif engine == "object":
+        df, snapshot = sim.runAggregations(seed=seed)
+    else:
+        raise ValueError("Unknown engine", engine)
+    tags = dict(overrides)
+    tags["Replicate"] = replicate
+    tags["Seed"] = seed
+    return pd.concat([pd.DataFrame(tags, index=df.index), df], axis=1)
+
+def iterSweep(parameterGrid, replicates=1, baseSeed=0, maxWorkers=None, engine="object"):
+    parameters = sim.getParameters()
+    with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+        futures = [executor.submit(runScenario, parameters, overrides, replicate, seed, engine)
+            for overrides, replicate, seed in sweepRuns(parameterGrid, replicates, baseSeed)]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+def sweep(parameterGrid, replicates=1, baseSeed=0, maxWorkers=None, engine="object"):
+    frames = list(iterSweep(parameterGrid, replicates, baseSeed, maxWorkers, engine))
+    columns = list(parameterGrid) + ["Replicate", "Day"]
+    return pd.concat(frames, ignore_index=True).sort_values(columns, ignore_index=True)
@@ -0,0 +1,112 @@
+import sys
+sys.path.append('../src/')
+import os
+import json
+import tempfile
+import unittest
+import covid19sim as sim
+import covid19batch as batch
+
+class TestCovid19Batch(unittest.TestCase):
+
+    def setUp(self):
+        sim.populationSize = 2048
+        sim.ratioNursesInPopulation = 0.015
+        sim.infectiousness = 0.15
+        sim.ppeProtection = 0.95
+        sim.proportionSevere = 0.2
+        sim.proportionSevereCritical = 0.25
+        sim.recoveryTime = 18
+        sim.fatalityRate = 0.01
+        sim.maxPatientsPerNurse = 4
+        sim.totalDays = 40
+        sim.icuBedsPerHundredThousand = 13.5
+        sim.strikeDays = 0
+        sim.ppeArrivalDay = 9999999
+        sim.prioritizeNursePatient = False
+        sim.setParameters({})
+        self.directory = tempfile.TemporaryDirectory()
+        self.scenarios = [{"name": "baseline"}, {"name": "strike", "strikeDays": 20}, {"ppeArrivalDay": 10, "replicates": 2}]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_00whenReadScenarioFiles_expectTypedOverrides(self):
+        with open(self.path("scenarios.csv"), "w") as f:
+            f.write("name,strikeDays,prioritizeNursePatient,infectiousness,seed\n")
+            f.write("a,10,true,,\n")
+            f.write("b,,no,0.2,5\n")
+        self.assertEqual([{"name": "a", "strikeDays": 10, "prioritizeNursePatient": True},
+            {"name": "b", "prioritizeNursePatient": False, "infectiousness": 0.2, "seed": 5}], batch.readScenarios(self.path("scenarios.csv")))
+        with open(self.path("scenarios.json"), "w") as f:
+            json.dump({"defaults": {"totalDays": 60}, "scenarios": [{"name": "a"}, {"strikeDays": 5}]}, f)
+        self.assertEqual([{"totalDays": 60, "name": "a"}, {"totalDays": 60, "strikeDays": 5}], batch.readScenarios(self.path("scenarios.json")))
+        with self.assertRaises(ValueError):
+            list(batch.batchRuns([{"notAParameter": 1}]))
+
+    def test_01whenRunBatch_expectOneRunPerScenarioReplicateAndSeededAggregations(self):
+        output = self.path("results.arrow")
+        self.assertEqual((4, 0), batch.runBatch(self.scenarios, output, baseSeed=1, maxWorkers=2))
+        df = batch.readBatch(output)
+        self.assertEqual(4 * sim.totalDays, len(df))
+        strike = df[df["Scenario"] == "strike"].reset_index(drop=True)
+        self.assertTrue((strike["strikeDays"] == 20).all())
+        sim.setParameters({"strikeDays": 20})
+        expected, snapshot = sim.runAggregations(seed=int(strike["Seed"].iloc[0]))
+        self.assertTrue(expected.equals(strike[expected.columns]))
+        sim.setParameters({"strikeDays": 0})
+        self.assertEqual((0, 4), batch.runBatch(self.scenarios, output, baseSeed=1, maxWorkers=2))
+
+    def test_02whenOutputCutShort_expectOnlyMissingRunsResumed(self):
+        complete = self.path("complete.arrow")
+        batch.runBatch(self.scenarios, complete, baseSeed=1, maxWorkers=1)
+        output = self.path("results.arrow")
+        with open(complete, "rb") as f:
+            data = f.read()
+        with open(output, "wb") as f:
+            f.write(data[:len(data) * 2 // 3])
+        ran, skipped = batch.runBatch(self.scenarios, output, baseSeed=1, maxWorkers=1)
+        self.assertEqual(4, ran + skipped)
+        self.assertTrue(ran >= 1 and skipped >= 1)
+        columns = ["Scenario", "Replicate", "Day"]
+        expected = batch.readBatch(complete).sort_values(columns, ignore_index=True)
+        self.assertTrue(expected.equals(batch.readBatch(output).sort_values(columns, ignore_index=True)))
+        self.assertFalse(os.path.exists(output + ".partial"))
+
+    def test_03whenSeedOrScenarioChanged_expectRunAgainAndEarlierResultsKept(self):
+        output = self.path("results.arrow")
+        scenarios = [{"name": "baseline"}, {"name": "strike", "strikeDays": 20}]
+        self.assertEqual((2, 0), batch.runBatch(scenarios, output, baseSeed=1, maxWorkers=1))
+        self.assertEqual((2, 0), batch.runBatch(scenarios, output, baseSeed=2, maxWorkers=1))
+        scenarios[1]["strikeDays"] = 10
+        self.assertEqual((1, 1), batch.runBatch(scenarios, output, baseSeed=2, maxWorkers=1))
+        df = batch.readBatch(output)
+        self.assertEqual(5 * sim.totalDays, len(df))
+        self.assertEqual({10, 20}, set(df.loc[df["Scenario"] == "strike", "strikeDays"]))
+
+    def test_04whenWidthChanged_expectWorkersRunOnThatWidth(self):
+        width = sim.width
+        try:
+            sim.width = 32
+            sim.setParameters({})
+            expected, snapshot = sim.runAggregations(seed=4)
+            df = batch.runBatchScenario(sim.getParameters(), 32, "narrow", {}, 0, 4)
+            sim.width = width
+            sim.setParameters({})
+            output = self.path("results.arrow")
+            batch.runBatch([{"name": "baseline"}], output, maxWorkers=1)
+            self.assertEqual((0, 1), batch.runBatch([{"name": "baseline"}], output, maxWorkers=1))
+            sim.width = 32
+            self.assertEqual((1, 0), batch.runBatch([{"name": "baseline"}], output, maxWorkers=1))
+        finally:
+            sim.width = width
+            sim.setParameters({})
+        self.assertTrue((df["Width"] == 32).all())
+        self.assertTrue(expected.equals(df[expected.columns]))
+        self.assertEqual({width, 32}, set(batch.readBatch(output)["Width"]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import sys
+sys.path.append('../src/')
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import covid19sim as sim
+import covid19cache as cache
+
+class TestCovid19Cache(unittest.TestCase):
+
+    def setUp(self):
+        sim.populationSize = 2048
+        sim.ratioNursesInPopulation = 0.015
+        sim.infectiousness = 0.15
+        sim.ppeProtection = 0.95
+        sim.proportionSevere = 0.2
+        sim.proportionSevereCritical = 0.25
+        sim.recoveryTime = 18
+        sim.fatalityRate = 0.01
+        sim.maxPatientsPerNurse = 4
+        sim.totalDays = 60
+        sim.icuBedsPerHundredThousand = 13.5
+        sim.strikeDays = 0
+        sim.ppeArrivalDay = 9999999
+        sim.prioritizeNursePatient = False
+        sim.setParameters({})
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = cache.ResultCache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_00whenRunTwice_expectSameFrameMemoryMapped(self):
+        first = self.cache.run(1)
+        second = self.cache.run(1)
+        self.assertTrue(first.equals(sim.run(1)))
+        # string columns come back as categoricals of the same values
+        self.assertEqual("category", second["legend"].dtype.name)
+        self.assertTrue(first.equals(second.astype(first.dtypes)))
+        for values in [second["day"].to_numpy(), second["legend"].array.codes]:
+            while values is not None and not isinstance(values, np.memmap):
+                values = values.base
+            self.assertIsInstance(values, np.memmap)
+
+        expected = sim.aggregations(first)
+        self.assertTrue(self.cache.aggregations(1).equals(expected))
+        entries = self.cache.entries()
+        path = self.cache.path(cache.resultKey("aggregations", 1))
+        files = {entry.name: entry.stat().st_mtime_ns for entry in os.scandir(path) if entry.name != cache.HEADER}
+        # a hit reads the entry back instead of running again
+        with mock.patch.object(sim, "runAggregations", side_effect=AssertionError("cache missed")):
+            self.assertTrue(self.cache.aggregations(1).equals(expected))
+        self.assertEqual(2, len(entries))
+        self.assertEqual(sorted(key for lastUsed, key, size in entries), sorted(key for lastUsed, key, size in self.cache.entries()))
+        self.assertEqual(files, {entry.name: entry.stat().st_mtime_ns for entry in os.scandir(path) if entry.name != cache.HEADER})
+
+    def test_01whenParametersOrSeedChange_expectNewEntry(self):
+        self.cache.aggregations(1)
+        self.cache.aggregations(2)
+        self.cache.aggregations(1, engine="grid")
+        sim.setParameters({"strikeDays": 5})
+        self.cache.aggregations(1)
+        self.cache.aggregations(None)
+        self.assertEqual(4, len(self.cache.entries()))
+
+    def test_02whenOverMaxBytes_expectLeastRecentlyUsedEvicted(self):
+        self.cache.aggregations(1)
+        size = self.cache.size()
+        self.cache.maxBytes = 2 * size
+        self.cache.aggregations(2)
+        for seed in (1, 2):
+            os.utime(os.path.join(self.cache.path(cache.resultKey("aggregations", seed)), cache.HEADER), (seed, seed))
+        self.cache.aggregations(1)
+        self.cache.aggregations(3)
+        self.assertEqual(2, len(self.cache.entries()))
+        self.assertIsNone(self.cache.get(cache.resultKey("aggregations", 2)))
+        self.assertIsNotNone(self.cache.get(cache.resultKey("aggregations", 1)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import sys
+sys.path.append('../src/')
+import unittest
+import numpy as np
+import covid19sim as sim
+import covid19ensemble as ensemble
+
+class TestCovid19Ensemble(unittest.TestCase):
+
+    def setUp(self):
+        sim.populationSize = 2048
+        sim.ratioNursesInPopulation = 0.015
+        sim.infectiousness = 0.15
+        sim.ppeProtection = 0.95
+        sim.proportionSevere = 0.2
+        sim.proportionSevereCritical = 0.25
+        sim.recoveryTime = 18
+        sim.fatalityRate = 0.01
+        sim.maxPatientsPerNurse = 4
+        sim.totalDays = 60
+        sim.icuBedsPerHundredThousand = 13.5
+        sim.strikeDays = 0
+        sim.ppeArrivalDay = 9999999
+        sim.prioritizeNursePatient = False
+
+    def test_00whenAddValues_expectSameMomentsAndQuantilesAsNumpy(self):
+        values = np.random.default_rng(0).normal(size=(1000, 3)) * [1, 10, 100]
+        moments = ensemble.RunningMoments(3)
+        low = ensemble.P2Quantile(0.05, 3)
+        high = ensemble.P2Quantile(0.95, 3)
+        for row in values:
+            moments.add(row)
+            low.add(row)
+            high.add(row)
+        self.assertTrue(np.allclose(values.mean(axis=0), moments.mean))
+        self.assertTrue(np.allclose(values.var(axis=0, ddof=1), moments.variance()))
+        self.assertTrue(np.allclose(np.quantile(values, 0.05, axis=0), low.value(), rtol=0.1))
+        self.assertTrue(np.allclose(np.quantile(values, 0.95, axis=0), high.value(), rtol=0.1))
+
+    def test_01whenEnsemble_expectOneRowPerDayWithBands(self):
+        df = ensemble.ensemble(6, baseSeed=1, maxWorkers=2)
+        self.assertEqual(sim.totalDays, len(df))
+        self.assertTrue((df["Replicates"] == 6).all())
+        for column in ensemble.ensembleColumns:
+            self.assertTrue((df[column + " 5%"] <= df[column + " 95%"]).all())
+            self.assertTrue((df[column + " Std"] >= 0).all())
+        self.assertTrue(df.equals(ensemble.ensemble(6, baseSeed=1, maxWorkers=1)))
+
+    def test_02whenConfidenceIntervalsConverge_expectEarlyStop(self):
+        df = ensemble.ensemble(40, baseSeed=2, maxWorkers=2, tolerance=10, minReplicates=3)
+        self.assertEqual(3, df["Replicates"].iloc[0])
+
+if __name__ == '__main__':
+    unittest.main()
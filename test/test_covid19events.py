@@ -0,0 +1,81 @@
+import sys
+sys.path.append('../src/')
+import unittest
+import numpy as np
+import covid19sim as sim
+import covid19events as events
+
+class TestCovid19Events(unittest.TestCase):
+
+    def setUp(self):
+        sim.populationSize = 2048
+        sim.ratioNursesInPopulation = 0.015
+        sim.infectiousness = 0.15
+        sim.ppeProtection = 0.95
+        sim.proportionSevere = 0.2
+        sim.proportionSevereCritical = 0.25
+        sim.recoveryTime = 18
+        sim.fatalityRate = 0.01
+        sim.maxPatientsPerNurse = 4
+        sim.totalDays = 120
+        sim.icuBedsPerHundredThousand = 13.5
+        sim.strikeDays = 0
+        sim.ppeArrivalDay = 9999999
+        sim.prioritizeNursePatient = False
+        sim.setParameters({})
+
+    def test_00whenNothingLeftToChance_expectSameRunAsDaily(self):
+        scenarios = [
+            {"infectiousness": 1, "ratioNursesInPopulation": 0, "proportionSevere": 0},
+            {"infectiousness": 1, "proportionSevere": 1, "proportionSevereCritical": 0, "fatalityRate": 0},
+            {"infectiousness": 1, "proportionSevere": 1, "proportionSevereCritical": 1, "fatalityRate": 0,
+                "prioritizeNursePatient": True, "strikeDays": 5},
+            {"infectiousness": 1, "ppeProtection": 1, "ppeArrivalDay": 10, "proportionSevere": 0}
+        ]
+        for parameters in scenarios:
+            daily = sim.Simulation(parameters, seed=1)
+            nextEvent = events.EventSimulation(parameters, seed=2)
+            self.assertTrue(daily.runAggregations()[0].equals(nextEvent.runAggregations()[0]))
+            self.assertEqual([person.infectionDay for person in daily.people], [person.infectionDay for person in nextEvent.people])
+
+    def test_01whenRunAggregations_expectOneRowPerDay(self):
+        df, snapshot = events.runAggregations(snapshotDays=[60], seed=1)
+        self.assertEqual(list(range(1, sim.totalDays + 1)), df["Day"].tolist())
+        self.assertEqual(df["Total Infections"].iloc[-1], df["New Infections"].sum())
+        self.assertEqual(sim.populationSize, len(snapshot))
+
+    def test_02whenRun_expectAggregationsLikeDaily(self):
+        # mid-epidemic, the mean of every total over seeded runs is within
+        # three standard errors of the daily engine's
+        parameters = {"totalDays": 40, "ppeArrivalDay": 20, "ratioNursesInPopulation": 0.1, "icuBedsPerHundredThousand": 1000}
+        replicates = 32
+        columns = ["Total Infections", "Total Dead", "Total Nurse Infections", "Total Nurses Dead", "ICU Occupancy"]
+        daily = np.array([sim.Simulation(parameters, seed=i).runAggregations()[0][columns].iloc[-1] for i in range(replicates)], dtype=float)
+        nextEvent = np.array([events.EventSimulation(parameters, seed=i).runAggregations()[0][columns].iloc[-1] for i in range(replicates)], dtype=float)
+        standardError = np.sqrt((daily.var(axis=0, ddof=1) + nextEvent.var(axis=0, ddof=1)) / replicates)
+        self.assertTrue((np.abs(daily.mean(axis=0) - nextEvent.mean(axis=0)) < 3 * standardError).all())
+        self.assertTrue(daily[:, 0].mean() < 0.5 * sim.populationSize)
+
+    def test_03whenOtherTopology_expectSameRunAsDaily(self):
+        parameters = {"infectiousness": 1, "ratioNursesInPopulation": 0, "proportionSevere": 0}
+        chain = sim.edgeListAdjacency([(i, i + 1) for i in range(sim.populationSize - 1)])
+        for topology in ["moore", "vonNeumannTorus", chain]:
+            daily = sim.Simulation(parameters, seed=1, topology=topology)
+            nextEvent = events.EventSimulation(parameters, seed=2, topology=topology)
+            self.assertTrue(daily.runAggregations()[0].equals(nextEvent.runAggregations()[0]))
+            self.assertEqual([person.infectionDay for person in daily.people], [person.infectionDay for person in nextEvent.people])
+
+    def test_04whenRunWithInstrumentation_expectSameRunAndOneRecordPerDay(self):
+        sim.totalDays = 30
+        expected, snapshot = events.EventSimulation(seed=4).runAggregations()
+        instrumentation = sim.Instrumentation()
+        df, snapshot = events.EventSimulation(seed=4).runAggregations(instrumentation=instrumentation)
+        self.assertTrue(expected.equals(df))
+        counters = instrumentation.toDataFrame()
+        self.assertEqual(list(range(1, sim.totalDays + 1)), counters["Day"].tolist())
+        self.assertEqual(df["New Infections"].iloc[1:].tolist(), counters["infections"].iloc[1:].tolist())
+        self.assertTrue((counters["exposures"] >= counters["infections"]).all())
+        self.assertTrue((counters["spreadSeconds"].iloc[1:] > 0).all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import sys
+sys.path.append('../src/')
+import unittest
+import math
+import numpy as np
+import covid19sim as sim
+import covid19grid as grid
+
+class TestCovid19Grid(unittest.TestCase):
+
+    def setUp(self):
+        sim.populationSize = 2048
+        sim.ratioNursesInPopulation = 0.015
+        sim.infectiousness = 0.15
+        sim.ppeProtection = 0.95
+        sim.proportionSevere = 0.2
+        sim.proportionSevereCritical = 0.25
+        sim.recoveryTime = 18
+        sim.fatalityRate = 0.01
+        sim.maxPatientsPerNurse = 4
+        sim.totalDays = 240
+        sim.icuBedsPerHundredThousand = 13.5
+        sim.strikeDays = 0
+        sim.ppeArrivalDay = 9999999
+        sim.prioritizeNursePatient = False
+        sim.initPopulation()
+
+    def test_00whenInitPopulation_expectSameNursesAsObjectModel(self):
+        g = grid.GridSimulation(0)
+        objectNurses = [i for i, person in enumerate(sim.people) if isinstance(person, sim.Nurse)]
+        self.assertEqual(objectNurses, g.nurseIndex.tolist())
+        objectOrder = [sim.people.index(nurse) for nurse in sim.hospital.nurses]
+        self.assertEqual(objectOrder, g.nurses())
+
+    def test_01whenRun1Day_expect1Infection(self):
+        sim.totalDays = 1
+        df = grid.run(0)
+        self.assertEqual(1, len(df))
+        self.assertEqual(1, df["wasInfected"].iloc[0])
+        self.assertEqual(1, df["newlyInfected"].iloc[0])
+
+    def test_02whenRun2Days100InfectiousSevereCritical_expect3Dead(self):
+        sim.totalDays = 2
+        sim.infectiousness = 1
+        sim.proportionSevere = 1
+        sim.proportionSevereCritical = 1
+        df = grid.run(0)
+        self.assertEqual(3, df["isDead"].iloc[-1])
+
+    def test_03when100InfectiousNoNursesDeaths_expectNSquaredInfections(self):
+        sim.totalDays = math.floor(sim.height ** 1/2)
+        sim.infectiousness = 1
+        sim.proportionSevere = 0
+        sim.ratioNursesInPopulation = 0
+        df = grid.run(0)
+        self.assertEqual(sim.totalDays ** 2 + (sim.totalDays - 1) ** 2, df["wasInfected"].iloc[-1])
+
+    def test_04whenRun_expectAggregationsLikeObjectModel(self):
+        # mid-epidemic, the mean of every total over seeded runs is within
+        # three standard errors of the object model's
+        sim.totalDays = 40
+        replicates = 32
+        columns = ["Total Infections", "Total Dead", "Total Nurse Infections", "Total Nurses Dead"]
+        objectTotals = np.array([sim.runAggregations(seed=i)[0][columns].iloc[-1] for i in range(replicates)], dtype=float)
+        gridTotals = np.array([sim.aggregations(grid.run(i))[columns].iloc[-1] for i in range(replicates)], dtype=float)
+        standardError = np.sqrt((objectTotals.var(axis=0, ddof=1) + gridTotals.var(axis=0, ddof=1)) / replicates)
+        self.assertTrue((np.abs(objectTotals.mean(axis=0) - gridTotals.mean(axis=0)) < 3 * standardError).all())
+        self.assertTrue(objectTotals[:, 0].mean() < 0.5 * sim.populationSize)
+
+    def test_05whenRunRasters_expectLegendCountsLikeCounts(self):
+        sim.totalDays = 60
+        df = grid.run(5)
+        for day, raster in grid.runRasters(5):
+            codes = np.bincount(raster.ravel(), minlength=256)
+            row = df.iloc[day - 1]
+            self.assertEqual(row["isDead"], codes[10] + codes[11])
+            self.assertEqual(row["isRecovered"], codes[2] + codes[3])
+            self.assertEqual(sim.populationSize - row["wasInfected"], codes[0] + codes[1])
+
+    def test_06whenIcuSaturated_expectDailySeriesLikeCounts(self):
+        sim.setParameters({"infectiousness": 0.3, "icuBedsPerHundredThousand": 100, "prioritizeNursePatient": True,
+            "ratioNursesInPopulation": 0.1, "proportionSevereCritical": 0.8, "totalDays": 120})
+        simulation = grid.GridSimulation(6)
+        occupancy = [simulation.counts(1)["isInIcu"]]
+        for i in range(1, sim.totalDays):
+            simulation.step(False, False)
+            occupancy.append(simulation.counts(i + 1)["isInIcu"])
+        icu = simulation.icuTimeSeries()
+        self.assertEqual(occupancy, icu["ICU Occupancy"].tolist())
+        self.assertTrue(icu["ICU Preemptions"].sum() > 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import sys
+sys.path.append('../src/')
+import unittest
+import numpy as np
+import covid19sim as sim
+import covid19grid as grid
+import covid19parallel as parallel
+
+class TestCovid19Parallel(unittest.TestCase):
+
+    def setUp(self):
+        sim.populationSize = 2048
+        sim.ratioNursesInPopulation = 0.015
+        sim.infectiousness = 0.15
+        sim.ppeProtection = 0.95
+        sim.proportionSevere = 0.2
+        sim.proportionSevereCritical = 0.25
+        sim.recoveryTime = 18
+        sim.fatalityRate = 0.01
+        sim.maxPatientsPerNurse = 4
+        sim.totalDays = 120
+        sim.icuBedsPerHundredThousand = 13.5
+        sim.strikeDays = 0
+        sim.ppeArrivalDay = 9999999
+        sim.prioritizeNursePatient = False
+        sim.setParameters({})
+
+    def test_00whenRun1Day_expect1Infection(self):
+        sim.totalDays = 1
+        df = parallel.run(0)
+        self.assertEqual(1, len(df))
+        self.assertEqual(1, df["wasInfected"].iloc[0])
+
+    def test_01whenRunWithDifferentWorkerCounts_expectSameRun(self):
+        first = parallel.run(1, strips=4, maxWorkers=1)
+        second = parallel.run(1, strips=4, maxWorkers=3)
+        self.assertEqual(sim.totalDays, len(first))
+        self.assertTrue(first.equals(second))
+
+    def test_02whenRun_expectAggregationsLikeGridEngine(self):
+        # mid-epidemic, the mean of every total over seeded runs is within
+        # three standard errors of the grid engine's
+        sim.totalDays = 40
+        replicates = 32
+        columns = ["Total Infections", "Total Dead", "Total Nurse Infections", "Total Nurses Dead"]
+        parallelTotals = np.array([sim.aggregations(parallel.run(i, strips=3))[columns].iloc[-1] for i in range(replicates)], dtype=float)
+        gridTotals = np.array([sim.aggregations(grid.run(i))[columns].iloc[-1] for i in range(replicates)], dtype=float)
+        standardError = np.sqrt((parallelTotals.var(axis=0, ddof=1) + gridTotals.var(axis=0, ddof=1)) / replicates)
+        self.assertTrue((np.abs(parallelTotals.mean(axis=0) - gridTotals.mean(axis=0)) < 3 * standardError).all())
+        self.assertTrue(gridTotals[:, 0].mean() < 0.5 * sim.populationSize)
+
+    def test_03whenIcuFillsEveryDay_expectOccupancyOfSameDayAsCounts(self):
+        sim.setParameters({"totalDays": 5, "infectiousness": 1, "proportionSevere": 1, "proportionSevereCritical": 1,
+            "icuBedsPerHundredThousand": 800})
+        df = parallel.run(3, strips=3)
+        expected = grid.run(3)
+        self.assertEqual(expected["isInIcu"].tolist(), df["isInIcu"].tolist())
+        self.assertEqual(0, df["isInIcu"].iloc[0])
+        self.assertTrue((df["isInIcu"] <= df["wasInfected"] - df["isDead"] - df["isRecovered"]).all())
+
+if __name__ == '__main__':
+    unittest.main()
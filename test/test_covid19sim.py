@@ -2,9 +2,22 @@ import sys
 sys.path.append('../src/')
 import unittest
 import math
+import random
+import threading
+import tempfile
+import os
+import subprocess
+import asyncio
+import tracemalloc
 import numpy as np
+import pandas as pd
 import covid19sim as sim
 
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 class TestCovid19Sim(unittest.TestCase):
 
     def setUp(self):
@@ -179,5 +192,469 @@ class TestCovid19Sim(unittest.TestCase):
         rowCount = df[(df["day"] == sim.totalDays) & (df["wasInfected"])].shape[0]
         self.assertEqual(sim.totalDays ** 2 + (sim.totalDays - 1) ** 2, rowCount)
 
+    def test_06whenRunAggregations_expectSameAsAggregationsOfRun(self):
+        sim.totalDays = 60
+        random.seed(6)
+        expected = sim.aggregations(sim.run())
+        random.seed(6)
+        df, snapshot = sim.runAggregations()
+        self.assertEqual(list(expected.columns), list(df.columns))
+        self.assertTrue((expected.values == df.values).all())
+        self.assertIsNone(snapshot)
+
+    def test_06whenRunAggregationsWithSnapshotDays_expectOnlyThoseDays(self):
+        sim.totalDays = 30
+        random.seed(6)
+        expected = sim.run()
+        random.seed(6)
+        df, snapshot = sim.runAggregations((1, 30))
+        self.assertEqual([1, 30], sorted(snapshot["day"].unique()))
+        expectedDay = expected[expected["day"] == 30].reset_index(drop=True)
+        snapshotDay = snapshot[snapshot["day"] == 30].reset_index(drop=True)
+        self.assertTrue((expectedDay["legend"] == snapshotDay["legend"].astype(str)).all())
+        self.assertTrue((expectedDay["isDead"] == snapshotDay["isDead"]).all())
+
+    def test_07whenRun_expectOnlyUnresolvedCasesActive(self):
+        sim.totalDays = 60
+        sim.run()
+        self.assertTrue(len(sim.active) < len(sim.infected))
+        for person in sim.active:
+            isUnresolved = person.infectionDay <= sim.recoveryTime
+            isExposingNurse = isinstance(person, sim.Nurse) \
+                and any(colleague.infectionDay is None for colleague in sim.getColleagues(person))
+            self.assertTrue(isUnresolved or isExposingNurse)
+        for person in sim.infected:
+            if person not in sim.active:
+                self.assertTrue(person.isDead() or person.isRecovered())
+
+    def test_08whenSimulationsRunInThreads_expectSameAsSequential(self):
+        parameters = [{"totalDays": 60}, {"totalDays": 60, "strikeDays": 30, "prioritizeNursePatient": True}]
+        expected = [sim.Simulation(p, seed=8).runAggregations()[0] for p in parameters]
+        simulations = [sim.Simulation(p, seed=8) for p in parameters]
+        results = [None, None]
+        def runSimulation(i):
+            results[i] = simulations[i].runAggregations()[0]
+        threads = [threading.Thread(target=runSimulation, args=(i,)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i in range(2):
+            self.assertTrue(expected[i].equals(results[i]))
+
+    def test_08whenSimulationRuns_expectModuleStateUntouched(self):
+        simulation = sim.Simulation({"populationSize": 1024, "totalDays": 20}, seed=8)
+        simulation.run()
+        self.assertEqual(1024, len(simulation.people))
+        self.assertEqual(16, simulation.height)
+        self.assertEqual(sim.populationSize, len(sim.people))
+        self.assertEqual(1, len(sim.infected))
+        for person in simulation.people:
+            self.assertIs(simulation, person.simulation)
+
+    def test_09whenRandomStream_expectGeneratorBlocksInOrder(self):
+        stream = sim.RandomStream(9, blockSize=8)
+        draws = [stream.random() for i in range(20)]
+        generator = np.random.default_rng(9)
+        expected = np.concatenate([generator.random(8) for i in range(3)])[:20].tolist()
+        self.assertEqual(expected, draws)
+
+    def test_09whenRunWithSameSeed_expectIdenticalOutput(self):
+        sim.totalDays = 60
+        first = sim.run(seed=9)
+        second = sim.run(seed=9)
+        self.assertEqual(first.to_csv(), second.to_csv())
+        other = sim.run(seed=10)
+        self.assertFalse(first.equals(other))
+
+    def test_09whenRunWithoutSeedAfterSeeded_expectGlobalRandomNotCheckpointed(self):
+        sim.totalDays = 5
+        sim.run(seed=9)
+        sim.run()
+        self.assertIs(sim.random, sim.defaultSimulation.random)
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(ValueError):
+                sim.defaultSimulation.saveCheckpoint(os.path.join(directory, "day5.npz"))
+
+    def test_10whenAssignNurse_expectRoundRobinOverNurses(self):
+        nurses = list(sim.hospital.nurses)
+        for i in range(2 * len(nurses)):
+            patient = sim.Person(sim.Position(0, i))
+            self.assertTrue(sim.hospital.assignNurse(patient))
+            self.assertIs(nurses[i % len(nurses)], patient.nurse)
+
+    def test_10whenNurseSevereOrDead_expectSkipped(self):
+        nurses = list(sim.hospital.nurses)
+        nurses[0].infect(sim.Severity.NONINV_VENT)
+        nurses[1].die()
+        patient = sim.Person(sim.Position(0, 0))
+        self.assertTrue(sim.hospital.assignNurse(patient))
+        self.assertIs(nurses[2], patient.nurse)
+        nurses[0].outcome = sim.Outcome.RECOVERED
+        sim.hospital.refreshNurse(nurses[0])
+        for i in range(len(nurses) - 2):
+            sim.hospital.assignNurse(sim.Person(sim.Position(0, i)))
+        self.assertEqual(1, len(nurses[0].patients))
+        self.assertEqual(0, len(nurses[1].patients))
+
+    def test_10whenPrioritizeNurseAndAllFull_expectNewestNonNursePatientPreempted(self):
+        sim.prioritizeNursePatient = True
+        sim.initPopulation()
+        expectedCapacity = len(sim.hospital.nurses) * sim.maxPatientsPerNurse
+        patients = []
+        for i in range(expectedCapacity):
+            patient = sim.Person(sim.Position(0, i))
+            patient.infect(sim.Severity.NONINV_VENT)
+            patient.infectionDay = 2 if i == 7 else 5
+            self.assertTrue(sim.hospital.assignNurse(patient))
+            patients.append(patient)
+        nurse = sim.Nurse(sim.Position(0, expectedCapacity))
+        self.assertTrue(sim.hospital.assignNurse(nurse))
+        self.assertTrue(patients[7].isDead())
+        self.assertEqual(1, len([patient for patient in patients if patient.isDead()]))
+        sim.prioritizeNursePatient = False
+        sim.initPopulation()
+
+    def test_10whenNurseTurnsSevereWithNursePatients_expectNoneAttachedBackToHer(self):
+        simulation = sim.Simulation({"totalDays": 120, "prioritizeNursePatient": True, "proportionSevere": 0.5, "maxPatientsPerNurse": 2}, seed=12)
+        simulation.initPopulation()
+        while not simulation.isFinished():
+            simulation.step()
+            for nurse in simulation.hospital.nurses:
+                for patient in nurse.patients:
+                    self.assertIs(nurse, patient.nurse)
+                if nurse.isSevere() and nurse.outcome is sim.Outcome.INFECTED:
+                    self.assertEqual([], nurse.patients)
+
+    def test_11whenResumeFromCheckpoint_expectSameAsUninterrupted(self):
+        parameters = {"totalDays": 120, "prioritizeNursePatient": True, "icuBedsPerHundredThousand": 100}
+        expected, snapshot = sim.Simulation(parameters, seed=11).runAggregations()
+        simulation = sim.Simulation(parameters, seed=11)
+        simulation.initPopulation()
+        while simulation.day < 60:
+            simulation.step()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "day60.npz")
+            simulation.saveCheckpoint(path)
+            resumed, snapshot = sim.loadCheckpoint(path).resumeAggregations()
+        self.assertTrue(expected.iloc[59:].reset_index(drop=True).equals(resumed))
+
+    def test_11whenBranchFromCheckpoint_expectParametersOverridden(self):
+        simulation = sim.Simulation({"totalDays": 60}, seed=11)
+        simulation.initPopulation()
+        while simulation.day < 30:
+            simulation.step()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "day30.npz")
+            simulation.saveCheckpoint(path)
+            branch = sim.loadCheckpoint(path, {"ppeArrivalDay": 30})
+        self.assertEqual(30, branch.day)
+        self.assertEqual(30, branch.ppeArrivalDay)
+        self.assertEqual(len(simulation.infected), len(branch.infected))
+        self.assertEqual([str(person) for person in simulation.active], [str(person) for person in branch.active])
+
+    def test_11whenBranchWithHospitalParameters_expectHospitalRebuilt(self):
+        simulation = sim.Simulation({"totalDays": 120}, seed=11)
+        simulation.initPopulation()
+        while simulation.day < 40:
+            simulation.step()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "day40.npz")
+            simulation.saveCheckpoint(path)
+            branch = sim.loadCheckpoint(path, {"maxPatientsPerNurse": 100, "icuBedsPerHundredThousand": 1000, "prioritizeNursePatient": True})
+            with self.assertRaises(ValueError):
+                sim.loadCheckpoint(path, {"populationSize": 4096})
+            # resolutions already scheduled, and days already run
+            with self.assertRaises(ValueError):
+                sim.loadCheckpoint(path, {"recoveryTime": 25})
+            with self.assertRaises(ValueError):
+                sim.loadCheckpoint(path, {"totalDays": 20})
+            same, snapshot = sim.loadCheckpoint(path, {"recoveryTime": sim.recoveryTime, "totalDays": 40}).resumeAggregations()
+        hospital = branch.hospital
+        self.assertEqual(branch.getTotalIcuBeds(), hospital.occupiedBeds.totalBeds)
+        self.assertEqual(simulation.hospital.head, hospital.head)
+        self.assertEqual([nurse for nurse in hospital.ring if nurse.canTakePatient()], [hospital.ring[i] for i in hospital.availableNurses])
+
+        # with every nurse full, a nurse takes the place of the newest
+        # patient assigned before the branch
+        patients = [patient for nurse in hospital.nurses for patient in nurse.patients if not isinstance(patient, sim.Nurse)]
+        self.assertTrue(len(patients) > 0)
+        newest = min(patient.infectionDay for patient in patients)
+        while len(hospital.availableNurses) > 0:
+            patient = sim.Person(sim.Position(0, 0), branch)
+            patient.infect(sim.Severity.NONINV_VENT)
+            patient.infectionDay = branch.day
+            hospital.assignNurse(patient)
+        nurse = sim.Nurse(sim.Position(0, 0), branch)
+        nurse.infect(sim.Severity.NONINV_VENT)
+        self.assertTrue(hospital.assignNurse(nurse))
+        preempted = [patient for patient in patients if patient.isDead() and patient.nurse is None]
+        self.assertEqual(1, len(preempted))
+        self.assertEqual(newest, preempted[0].infectionDay)
+
+        resumed, snapshot = branch.resumeAggregations()
+        self.assertTrue(resumed["ICU Occupancy"].max() > 1)
+        self.assertEqual([40], same["Day"].tolist())
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_12whenRunToParquet_expectSameAggregationsAndDaysAsRun(self):
+        sim.totalDays = 40
+        expected = sim.run(seed=12)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run.parquet")
+            sim.runToParquet(path, seed=12)
+            self.assertTrue(sim.aggregations(expected).equals(sim.aggregations(path)))
+            day = sim.readDay(path, 40)
+        expectedDay = expected[expected["day"] == 40].reset_index(drop=True)
+        self.assertEqual(len(expectedDay), len(day))
+        self.assertEqual("category", day["legend"].dtype.name)
+        self.assertTrue((expectedDay["legend"] == day["legend"].astype(str)).all())
+
+    def test_13whenRunWithInstrumentation_expectSameRunAndOneRecordPerDay(self):
+        sim.totalDays = 60
+        expected, snapshot = sim.runAggregations(seed=13)
+        records = []
+        instrumentation = sim.Instrumentation(records.append)
+        df, snapshot = sim.runAggregations(seed=13, instrumentation=instrumentation)
+        self.assertTrue(expected.equals(df))
+        counters = instrumentation.toDataFrame()
+        self.assertEqual(list(range(1, sim.totalDays + 1)), counters["Day"].tolist())
+        self.assertEqual(len(records), len(counters))
+        self.assertEqual(df["Total Infections"].iloc[-1] - 1, counters["infections"].sum())
+        self.assertTrue((counters["exposures"] >= counters["infections"]).all())
+        self.assertEqual(sim.totalDays, len(df.merge(counters, on="Day")))
+
+    def test_14whenRunChunked_expectSameRunAsDense(self):
+        parameters = {"totalDays": 80, "prioritizeNursePatient": True}
+        expected = sim.Simulation(parameters, seed=14).run()
+        chunked = sim.Simulation(parameters, seed=14, tileSize=16)
+        self.assertTrue(expected.equals(chunked.run()))
+
+    def test_14whenRunChunkedFewDays_expectOnlyTilesAroundOutbreak(self):
+        width = 1024
+        parameters = {"populationSize": width * width, "totalDays": 10}
+        chunked = sim.Simulation(parameters, seed=14, width=width, tileSize=64)
+        df, snapshot = chunked.runAggregations()
+        self.assertTrue(df["Total Infections"].iloc[-1] > 1)
+        self.assertTrue(chunked.people.tileCount() <= 4)
+
+    def test_14whenResumeChunkedFromCheckpoint_expectSameAsDense(self):
+        parameters = {"totalDays": 60}
+        chunked = sim.Simulation(parameters, seed=14, tileSize=16)
+        chunked.initPopulation()
+        for i in range(30):
+            chunked.step()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "day30.npz")
+            chunked.saveCheckpoint(path)
+            dense = sim.loadCheckpoint(path)
+            restored = sim.Simulation(tileSize=16)
+            restored.loadCheckpoint(path)
+        expected, snapshot = dense.resumeAggregations()
+        df, snapshot = restored.resumeAggregations()
+        self.assertTrue(expected.equals(df))
+
+    def test_14whenCheckpointChunkedFewDays_expectOnlyTilesAroundOutbreak(self):
+        width = 512
+        parameters = {"populationSize": width * width, "totalDays": 20}
+        chunked = sim.Simulation(parameters, seed=14, width=width, tileSize=64)
+        chunked.initPopulation()
+        for i in range(10):
+            chunked.step()
+        self.assertTrue(chunked.people.tileCount() <= 4)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "day10.npz")
+            tracemalloc.start()
+            chunked.saveCheckpoint(path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            restored = sim.Simulation(tileSize=64)
+            restored.loadCheckpoint(path)
+        # a Person for every cell would take tens of megabytes
+        self.assertTrue(peak < 16 * 1024 * 1024)
+        self.assertTrue(restored.people.tileCount() <= 4)
+        expected, snapshot = chunked.resumeAggregations()
+        df, snapshot = restored.resumeAggregations()
+        self.assertTrue(expected.equals(df))
+
+    def test_15whenCreatePeople_expectNoInstanceDict(self):
+        nurse = sim.Nurse(sim.Position(1, 2))
+        for value in [sim.Position(1, 2), sim.Person(sim.Position(1, 2)), nurse]:
+            self.assertFalse(hasattr(value, "__dict__"))
+        self.assertEqual("1,2", str(nurse))
+        self.assertEqual([], nurse.patients)
+
+    def test_17whenRunRasters_expectSameLegendsAsRun(self):
+        sim.totalDays = 60
+        rasters = list(sim.Simulation(seed=17).runRasters())
+        df = sim.Simulation(seed=17).run()
+        self.assertEqual(list(range(1, sim.totalDays + 1)), [day for day, raster in rasters])
+        for (day, raster), (dfDay, expected) in zip(rasters, sim.spreadRasters(df)):
+            self.assertTrue((expected == raster).all())
+        lastDay = df[df["day"] == sim.totalDays]
+        codes = rasters[-1][1][lastDay["y"], lastDay["x"]]
+        self.assertEqual(lastDay["legend"].tolist(), [sim.legendNames[code] for code in codes])
+
+    def test_17whenRenderRasters_expectOneFrameAndPngPerDay(self):
+        sim.totalDays = 20
+        rasters = list(sim.runRasters(seed=17))
+        fig = sim.animateSpread(rasters, maxSide=16)
+        self.assertEqual(sim.totalDays, len(fig.frames))
+        self.assertEqual(16, max(fig.frames[0].data[0].z.shape))
+        with tempfile.TemporaryDirectory() as directory:
+            paths = sim.writeSpreadPngs(rasters, directory, scale=2)
+            self.assertEqual(sim.totalDays, len(paths))
+            with open(paths[-1], "rb") as f:
+                self.assertEqual(b"\x89PNG\r\n\x1a\n", f.read(8))
+
+    def test_18whenPollMidRun_expectAggregationsOfDaysSoFar(self):
+        sim.totalDays = 60
+        simulation = sim.Simulation(seed=18)
+        polled = []
+        instrumentation = sim.Instrumentation(lambda record: polled.append(simulation.liveAggregations()))
+        expected = sim.aggregations(simulation.run(instrumentation=instrumentation))
+        self.assertEqual(sim.totalDays, len(polled))
+        self.assertTrue(expected.head(30).equals(polled[29]))
+        self.assertTrue(expected.equals(simulation.liveAggregations()))
+        self.assertEqual(list(sim.aggregationColumns.values()), list(polled[0].columns))
+
+    def test_18whenResumeFromCheckpoint_expectTotalsRecounted(self):
+        simulation = sim.Simulation({"totalDays": 80, "proportionSevere": 0.5}, seed=18)
+        expected, snapshot = simulation.runAggregations()
+        simulation.seed(18)
+        simulation.initPopulation()
+        while simulation.day < 40:
+            simulation.step()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "day40.npz")
+            simulation.saveCheckpoint(path)
+            resumed = sim.loadCheckpoint(path)
+        df, snapshot = resumed.resumeAggregations()
+        self.assertTrue(expected.iloc[39:].reset_index(drop=True).equals(df))
+        self.assertTrue(df.equals(resumed.liveAggregations()))
+
+    def test_19whenRunDays_expectAggregationsOneDayAtATime(self):
+        sim.totalDays = 60
+        expected, snapshot = sim.runAggregations(seed=19)
+        self.assertTrue(expected.equals(pd.DataFrame(list(sim.runDays(seed=19)))))
+        simulation = sim.Simulation(seed=19)
+        for record in simulation.runDays():
+            if record["Day"] == 10:
+                break
+        self.assertEqual(10, simulation.day)
+
+    def test_19whenRunDaysAsyncAndCancel_expectInterleavedAndStopped(self):
+        sim.totalDays = 60
+        days = []
+        async def consume(simulation, name):
+            async for record in simulation.runDaysAsync():
+                days.append((name, record["Day"]))
+        async def serve():
+            cancelled = sim.Simulation({"totalDays": 240}, seed=1)
+            task = asyncio.create_task(consume(cancelled, "cancelled"))
+            await consume(sim.Simulation(seed=2), "finished")
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return cancelled
+        cancelled = asyncio.run(serve())
+        self.assertEqual([("finished", 1), ("cancelled", 1), ("finished", 2), ("cancelled", 2)], days[:4])
+        self.assertEqual(sim.totalDays, len([name for name, day in days if name == "finished"]))
+        self.assertTrue(cancelled.day <= sim.totalDays + 1)
+
+    def test_20whenGridAdjacency_expectSameNeighboursAsCoordinates(self):
+        for size, width in ((2048, 64), (100, 7), (1, 1)):
+            height = math.floor(size / width)
+            for topology in sim.topologies:
+                dense = sim.Simulation({"populationSize": size}, width=width, topology=topology)
+                dense.initPopulation()
+                sparse = sim.Simulation({"populationSize": size}, width=width, topology=topology, tileSize=4)
+                sparse.initPopulation()
+                for i, person in enumerate(dense.people):
+                    self.assertEqual(sparse.neighbourIndices(person), dense.neighbourIndices(person).tolist())
+        adjacency = sim.gridAdjacency(12, 4, 3)
+        self.assertEqual(np.int32, adjacency.offsets.dtype)
+        self.assertEqual([0, 2, 5], adjacency.offsets[:3].tolist())
+        self.assertEqual([1, 4, 0, 2, 5], adjacency.indices[:5].tolist())
+
+    def test_20whenEverybodyInfectedByContacts_expectSpreadFollowsTopology(self):
+        parameters = {"infectiousness": 1, "proportionSevere": 0, "ratioNursesInPopulation": 0, "totalDays": 11}
+        n = parameters["totalDays"] - 1
+        expected = {"vonNeumann": 2 * n * n + 2 * n + 1, "moore": (2 * n + 1) ** 2}
+        for topology, infections in expected.items():
+            df, snapshot = sim.Simulation(parameters, seed=20, topology=topology).runAggregations()
+            self.assertEqual(infections, df["Total Infections"].iloc[-1])
+        self.assertEqual([2, 3, 4], sorted(set(sim.gridAdjacency(256, 16, 16, "vonNeumann").degree().tolist())))
+        self.assertEqual([4], sorted(set(sim.gridAdjacency(256, 16, 16, "vonNeumannTorus").degree().tolist())))
+        self.assertEqual([8], sorted(set(sim.gridAdjacency(256, 16, 16, "mooreTorus").degree().tolist())))
+        self.assertEqual([15, 1, 240, 16], sim.gridAdjacency(256, 16, 16, "vonNeumannTorus").indices[:4].tolist())
+
+    def test_20whenEdgeListTopology_expectSpreadAlongEdgesAndCheckpointed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "chain.txt")
+            with open(path, "w") as f:
+                f.write("# a chain through everybody\n")
+                for i in range(2047):
+                    f.write("%d %d\n" % (i + 1, i))
+            chain = sim.loadEdgeList(path)
+            self.assertEqual(2048, len(chain))
+            self.assertEqual([1023, 1025], chain.indices[chain.offsets[1024]:chain.offsets[1025]].tolist())
+            parameters = {"infectiousness": 1, "proportionSevere": 0, "ratioNursesInPopulation": 0, "totalDays": 40}
+            expected, snapshot = sim.Simulation(parameters, seed=20, topology=chain).runAggregations()
+            self.assertEqual([1] + [2] * 39, expected["New Infections"].tolist())
+
+            simulation = sim.Simulation(parameters, seed=20, topology=chain)
+            simulation.initPopulation()
+            while simulation.day < 20:
+                simulation.step()
+            checkpoint = os.path.join(directory, "day20.npz")
+            simulation.saveCheckpoint(checkpoint)
+            restored = sim.loadCheckpoint(checkpoint)
+        resumed, snapshot = restored.resumeAggregations()
+        self.assertTrue(expected.iloc[19:].reset_index(drop=True).equals(resumed))
+        with self.assertRaises(ValueError):
+            sim.Simulation({"populationSize": 1024}, topology=chain).initPopulation()
+
+    def test_21whenImportEngines_expectNoPandasOrPlotly(self):
+        code = "import sys; import covid19sim, covid19grid, covid19events; print(' '.join(name for name in ('pandas', 'plotly') if name in sys.modules))"
+        source = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+        completed = subprocess.run([sys.executable, "-c", code], env=dict(os.environ, PYTHONPATH=source), capture_output=True, text=True, check=True)
+        self.assertEqual("", completed.stdout.strip())
+
+    def test_22whenIcuSaturated_expectDailySeriesLikeAggregationsAndCounters(self):
+        parameters = {"infectiousness": 0.3, "icuBedsPerHundredThousand": 100, "prioritizeNursePatient": True,
+            "ratioNursesInPopulation": 0.1, "proportionSevereCritical": 0.8, "totalDays": 120}
+        simulation = sim.Simulation(parameters, seed=22)
+        instrumentation = sim.Instrumentation()
+        df, snapshot = simulation.runAggregations(instrumentation=instrumentation)
+        icu = simulation.hospital.icuTimeSeries()
+        counters = instrumentation.toDataFrame()
+        self.assertEqual(df["Day"].tolist(), icu["Day"].tolist())
+        self.assertEqual(df["ICU Occupancy"].tolist(), icu["ICU Occupancy"].tolist())
+        self.assertEqual(counters["icuRejections"].tolist(), icu["ICU Rejections"].tolist())
+        self.assertEqual(counters["icuPreemptions"].tolist(), icu["ICU Preemptions"].tolist())
+        self.assertTrue(icu["ICU Preemptions"].sum() > 0)
+        self.assertEqual(np.int32, simulation.hospital.occupiedBeds.daily.dtype)
+
+    def test_22whenPreemptIcuBed_expectOldestNonNurseInLogTime(self):
+        beds = sim.IcuBeds(3, 10)
+        beds.admit("nurse", True, 1)
+        beds.admit("first", False, 2)
+        beds.admit("second", False, 2)
+        self.assertTrue(beds.isFull())
+        self.assertEqual("first", beds.oldestNonNurse())
+        beds.release("first", 4)
+        self.assertEqual("second", beds.oldestNonNurse())
+        self.assertEqual(1, len(beds.nonNurses))
+        beds.release("second", 4)
+        beds.admit("other", True, 5)
+        self.assertIsNone(beds.oldestNonNurse())
+        self.assertEqual(["nurse", "other"], list(beds))
+        beds.reject(5)
+        self.assertEqual([1, 3, 3, 1, 2], beds.daily[0, :5].tolist())
+        self.assertEqual([1, 2, 0, 0, 1], beds.daily[1, :5].tolist())
+        self.assertEqual([0, 0, 0, 0, 1], beds.daily[2, :5].tolist())
+        self.assertEqual([1, 3, 3, 1, 2, 2, 2], beds.timeSeries(7)["ICU Occupancy"].tolist())
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,55 @@
+import sys
+sys.path.append('../src/')
+import unittest
+import covid19sim as sim
+import covid19sweep as sweep
+
+class TestCovid19Sweep(unittest.TestCase):
+
+    def setUp(self):
+        sim.populationSize = 2048
+        sim.ratioNursesInPopulation = 0.015
+        sim.infectiousness = 0.15
+        sim.ppeProtection = 0.95
+        sim.proportionSevere = 0.2
+        sim.proportionSevereCritical = 0.25
+        sim.recoveryTime = 18
+        sim.fatalityRate = 0.01
+        sim.maxPatientsPerNurse = 4
+        sim.totalDays = 40
+        sim.icuBedsPerHundredThousand = 13.5
+        sim.strikeDays = 0
+        sim.ppeArrivalDay = 9999999
+        sim.prioritizeNursePatient = False
+
+    def test_00whenExpandGridWithUnknownParameter_expectValueError(self):
+        with self.assertRaises(ValueError):
+            list(sweep.expandGrid({"notAParameter": [1]}))
+
+    def test_01whenSweep_expectOneTaggedRunPerCombinationAndReplicate(self):
+        grid = {"strikeDays": [0, 20], "prioritizeNursePatient": [False, True]}
+        df = sweep.sweep(grid, replicates=2, baseSeed=1, maxWorkers=2)
+        self.assertEqual(2 * 2 * 2 * sim.totalDays, len(df))
+        runs = df.groupby(["strikeDays", "prioritizeNursePatient", "Replicate"]).size()
+        self.assertEqual(8, len(runs))
+        self.assertTrue((runs == sim.totalDays).all())
+        for column in sim.aggregationColumns.values():
+            self.assertTrue(column in df.columns)
+
+    def test_02whenSweepTwiceWithSameSeed_expectSameResult(self):
+        grid = {"infectiousness": [0.1, 0.2]}
+        first = sweep.sweep(grid, replicates=2, baseSeed=3, maxWorkers=2)
+        second = sweep.sweep(grid, replicates=2, baseSeed=3, maxWorkers=1)
+        self.assertTrue(first.equals(second))
+        self.assertEqual(4, first["Seed"].nunique())
+
+    def test_03whenRunScenario_expectParametersResetBetweenRuns(self):
+        parameters = sim.getParameters()
+        sweep.runScenario(parameters, {"strikeDays": 40}, 0, 5)
+        self.assertEqual(40, sim.strikeDays)
+        df = sweep.runScenario(parameters, {}, 0, 5)
+        self.assertEqual(0, sim.strikeDays)
+        self.assertEqual(sim.totalDays, len(df))
+
+if __name__ == '__main__':
+    unittest.main()